@@ -1,18 +1,23 @@
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph.message import add_messages
 from langchain_core.messages import SystemMessage, HumanMessage, ToolMessage, AIMessage
+from langchain_core.runnables import RunnableConfig
 from typing_extensions import TypedDict, Annotated
-import operator
+import asyncio
+import contextvars
+import re
+import threading
+import pytz
+import compaction
+import llm_cache
+import llm_router
+import metrics
+import tool_budget
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 import logging
 
-# Import your tools
-from tools.calculate import calculate
-from tools.wikipedia import wikipedia
-from tools.notes import add_note, get_notes
-from tools.calendar import set_reminder
-from tools.websearch import web_search
+# Tool modules load on first use through the registry
+from tools import get_tool, load_tools
 
 load_dotenv()
 
@@ -20,25 +25,69 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# LLM with better configuration
-llm = ChatOpenAI(
-    model="gpt-4o-mini",  # Updated model name
-    temperature=0,
-    max_retries=2,
-    request_timeout=30
-)
-
-# List of tools
-tools = [calculate, wikipedia, add_note, get_notes, set_reminder, web_search]
-tools_by_name = {tool.name: tool for tool in tools}
-
-# Bind tools to LLM
-llm_with_tools = llm.bind_tools(tools)
+# The LLM client and the tool-bound model are created on first use (or by
+# warm_up() from the app's init hook): langchain_openai alone takes about a
+# second to import. Both are llm_router.LLMRouter instances, which hedge slow
+# requests and fail over to the fallback model.
+llm = None
+llm_with_tools = None
+tools_fingerprint = None
+_llm_lock = threading.Lock()
+
+
+def get_llm():
+    global llm
+    with _llm_lock:
+        if llm is None:
+            llm = llm_router.build()
+    return llm
+
+
+def get_llm_with_tools():
+    """The LLM with every registered tool bound"""
+    global llm_with_tools, tools_fingerprint
+    model = get_llm()
+    with _llm_lock:
+        if llm_with_tools is None:
+            llm_with_tools = model.bind_tools(load_tools())
+        if tools_fingerprint is None:
+            tools_fingerprint = llm_cache.tools_fingerprint(load_tools())
+    return llm_with_tools
+
+
+def llm_stats() -> dict:
+    """Hedging and failover counters of the tool-bound LLM, if it has been created"""
+    stats = getattr(llm_with_tools, "stats", None)
+    return stats() if stats else {}
+
+
+def warm_up():
+    """
+    Create the LLM client, load every tool module and the tokenizer ahead of
+    the first message; tiktoken may download its encoding, which must not
+    happen on the event loop
+    """
+    get_llm_with_tools()
+    compaction._encoding()
+
+# Tool execution limits: per-tool timeouts (seconds) and a cap on how many
+# calls of the same tool may run at once, so one tool cannot hog the loop
+DEFAULT_TOOL_TIMEOUT = 20
+TOOL_TIMEOUTS = {"wikipedia": 10, "web_search": 10, "calculate": 5}
+MAX_CONCURRENT_PER_TOOL = 4
+tool_semaphores = {}
+
+# Callers may set this to a dict before running the graph; tool_node marks
+# it committed before any tool runs, after which the run has side effects
+# and must not be cancelled and retried
+run_guard = contextvars.ContextVar("run_guard", default=None)
 
 
 # Enhanced Agent State with conversation history limit
+# (add_messages lets callers drop old history with RemoveMessage)
 class AgentState(TypedDict):
-    messages: Annotated[list, operator.add]
+    messages: Annotated[list, add_messages]
+    summary: str
 
 
 # System prompt for better agent behavior
@@ -47,8 +96,10 @@ SYSTEM_PROMPT = """You are Gaia, a helpful AI assistant with access to various t
 When using tools:
 - Use calculate for math operations
 - Use wikipedia for factual information
-- Use add_note to save information and get_notes to retrieve saved information
+- Use add_note to save information, search_notes to find specific saved notes and get_notes to page through them
 - Use set_reminder to schedule future reminders (accepts: '30s', '5m', '2h', 'tomorrow at 3pm')
+- Use set_recurring_reminder for repeating reminders ('daily at 9am', 'every monday at 10am'),
+  list_reminders to show them and cancel_reminder to cancel one by ID
 - Use web_search for current information or when wikipedia doesn't have what you need
 
 IMPORTANT: When setting reminders, if the tool returns an error about time being in the past, 
@@ -57,84 +108,154 @@ check the current time first with get_current_time, then calculate the correct f
 Be concise but helpful. If a tool fails after 2-3 attempts, explain the issue to the user rather than retrying endlessly."""
 
 
-def agent_node(state: AgentState):
+@metrics.timed("gaia_node_seconds", node="compact")
+async def compact_node(state: AgentState):
+    """Fold turns that exceed the history limits into the running summary"""
+    return await compaction.compact(state["messages"], state.get("summary", ""), get_llm())
+
+
+async def _call_llm(messages: list):
+    """LLM round trip, served from the response cache when enabled"""
+    if not llm_cache.ENABLED or llm_cache.bypass(messages):
+        return await _invoke_llm(messages, get_llm_with_tools())
+
+    model = get_llm_with_tools()
+    key = llm_cache.make_key(get_llm().model_name, tools_fingerprint, messages)
+    cached = await llm_cache.lookup(key)
+    if cached is not None:
+        logger.debug("LLM cache hit")
+        return cached
+
+    response = await _invoke_llm(messages, model)
+    await llm_cache.store(key, response)
+    return response
+
+
+async def _invoke_llm(messages: list, model):
+    with metrics.timer("gaia_llm_seconds"):
+        response = await model.ainvoke(messages)
+    usage = getattr(response, "usage_metadata", None) or {}
+    metrics.inc("gaia_llm_tokens_total", usage.get("input_tokens", 0), kind="prompt")
+    metrics.inc("gaia_llm_tokens_total", usage.get("output_tokens", 0), kind="completion")
+    return response
+
+
+@metrics.timed("gaia_node_seconds", node="agent")
+async def agent_node(state: AgentState):
     """Agent decision node with error handling and system prompt injection"""
     try:
         messages = state["messages"]
+        system_msgs = [m for m in messages if isinstance(m, SystemMessage)]
 
         # Inject system prompt if not present
-        if not any(isinstance(m, SystemMessage) for m in messages):
-            messages = [SystemMessage(content=SYSTEM_PROMPT)] + messages
+        if not system_msgs:
+            system_msgs = [SystemMessage(content=SYSTEM_PROMPT)]
+
+        summary = state.get("summary")
+        if summary:
+            system_msgs = system_msgs + [SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")]
 
-        # Limit conversation history to last 20 messages to avoid token limits
-        if len(messages) > 20:
-            system_msgs = [m for m in messages if isinstance(m, SystemMessage)]
-            recent_msgs = messages[-19:]  # Keep last 19 + system message = 20
-            messages = system_msgs + recent_msgs
+        # compact_node runs before every agent step, so whatever is left is
+        # within COMPACT_TRIGGER_TOKENS and goes in whole; the cap only bites
+        # if compaction failed, and the turns it leaves out stay in the state
+        # to be summarized on the next attempt
+        messages = system_msgs + compaction.select_recent(messages, compaction.COMPACT_TRIGGER_TOKENS)
 
-        logger.info(f"Agent processing {len(messages)} messages")
-        response = llm_with_tools.invoke(messages)
+        logger.debug("Agent processing %d messages", len(messages))
+        response = await _call_llm(messages)
 
         # Log tool calls for debugging
         if hasattr(response, 'tool_calls') and response.tool_calls:
-            logger.info(f"Agent requesting tools: {[tc['name'] for tc in response.tool_calls]}")
+            logger.debug("Agent requesting tools: %s", [tc["name"] for tc in response.tool_calls])
 
         return {"messages": [response]}
 
     except Exception as e:
-        logger.error(f"Error in agent_node: {e}")
+        logger.error("Error in agent_node: %s", e)
         # Return error message to user
         error_msg = AIMessage(content=f"I encountered an error: {str(e)}. Let me try to help you another way.")
         return {"messages": [error_msg]}
 
 
-def tool_node(state: AgentState):
-    """Tool execution node with error handling"""
-    results = []
-    last_message = state["messages"][-1]
-
-    for tool_call in last_message.tool_calls:
-        tool_name = tool_call["name"]
-        tool_args = tool_call["args"]
+async def _run_tool(tool_call: dict, config: RunnableConfig, question: str = "") -> ToolMessage:
+    """Run one tool call under its concurrency limit and timeout"""
+    tool_name = tool_call["name"]
+    tool_args = tool_call["args"]
 
-        try:
-            tool = tools_by_name.get(tool_name)
-            if not tool:
-                raise ValueError(f"Tool '{tool_name}' not found")
+    try:
+        tool = get_tool(tool_name)
+        if not tool:
+            raise ValueError(f"Tool '{tool_name}' not found")
+
+        semaphore = tool_semaphores.setdefault(tool_name, asyncio.Semaphore(MAX_CONCURRENT_PER_TOOL))
+        timeout = TOOL_TIMEOUTS.get(tool_name, DEFAULT_TOOL_TIMEOUT)
+
+        async with semaphore:
+            logger.debug("Executing tool %s with args %s", tool_name, tool_args)
+            with metrics.timer("gaia_tool_seconds", tool=tool_name):
+                result = await asyncio.wait_for(tool.ainvoke(tool_args, config), timeout=timeout)
+        logger.debug("Tool %s result: %.100s", tool_name, result)
+        metrics.inc("gaia_tool_calls_total", tool=tool_name, status="ok")
+
+        # Post-tool stage: long outputs are cut to the tool's token budget,
+        # keeping what is most relevant to the question and the arguments
+        query = " ".join([question, *map(str, tool_args.values())])
+        return ToolMessage(
+            content=tool_budget.apply(tool_name, str(result), query),
+            tool_call_id=tool_call["id"],
+            name=tool_name
+        )
+
+    except asyncio.TimeoutError:
+        logger.error("Tool %s timed out", tool_name)
+        metrics.inc("gaia_tool_calls_total", tool=tool_name, status="timeout")
+        return ToolMessage(
+            content=f"Error: tool '{tool_name}' timed out",
+            tool_call_id=tool_call["id"],
+            name=tool_name
+        )
+    except Exception as e:
+        logger.error("Error executing tool %s: %s", tool_name, e)
+        metrics.inc("gaia_tool_calls_total", tool=tool_name, status="error")
+        return ToolMessage(
+            content=f"Error: {str(e)}",
+            tool_call_id=tool_call["id"],
+            name=tool_name
+        )
+
+
+@metrics.timed("gaia_node_seconds", node="tools")
+async def tool_node(state: AgentState, config: RunnableConfig):
+    """Tool execution node; runs all tool calls of one step concurrently"""
+    last_message = state["messages"][-1]
 
-            logger.info(f"Executing tool: {tool_name} with args: {tool_args}")
-            result = tool.invoke(tool_args)
-            logger.info(f"Tool {tool_name} result: {str(result)[:100]}...")
+    guard = run_guard.get()
+    if guard is not None:
+        guard["committed"] = True
 
-            results.append(
-                ToolMessage(
-                    content=str(result),
-                    tool_call_id=tool_call["id"],
-                    name=tool_name
-                )
-            )
+    question = next((str(m.content) for m in reversed(state["messages"]) if isinstance(m, HumanMessage)), "")
 
-        except Exception as e:
-            logger.error(f"Error executing tool {tool_name}: {e}")
-            results.append(
-                ToolMessage(
-                    content=f"Error: {str(e)}",
-                    tool_call_id=tool_call["id"],
-                    name=tool_name
-                )
-            )
+    # gather() preserves input order, so results line up with tool_call ids
+    results = await asyncio.gather(*(_run_tool(tc, config, question) for tc in last_message.tool_calls))
 
-    return {"messages": results}
+    return {"messages": list(results)}
 
 
 def should_continue(state: AgentState):
     """Conditional edge with max iteration check"""
+    if not state["messages"]:
+        return END
     last_message = state["messages"][-1]
 
-    # Safety check: prevent infinite loops (max 5 tool iterations)
-    tool_messages = [m for m in state["messages"] if isinstance(m, ToolMessage)]
+    # Safety check: prevent infinite loops (max 5 tool iterations per user turn)
+    tool_messages = []
+    for m in reversed(state["messages"]):
+        if isinstance(m, HumanMessage):
+            break
+        if isinstance(m, ToolMessage):
+            tool_messages.append(m)
     if len(tool_messages) >= 5:
-        logger.warning(f"Max tool iterations reached ({len(tool_messages)} tool calls)")
+        logger.warning("Max tool iterations reached (%d tool calls)", len(tool_messages))
         return END
 
     if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
@@ -145,17 +266,104 @@ def should_continue(state: AgentState):
 
 # Build the StateGraph
 workflow = StateGraph(AgentState)
+workflow.add_node("compact", compact_node)
 workflow.add_node("agent", agent_node)
 workflow.add_node("tools", tool_node)
 
-workflow.add_edge(START, "agent")
+workflow.add_edge(START, "compact")
+workflow.add_edge("compact", "agent")
 workflow.add_conditional_edges(
     "agent",
     should_continue,
     {"tools": "tools", END: END}
 )
-workflow.add_edge("tools", "agent")
+# Tool results can push history past the trigger mid-run
+workflow.add_edge("tools", "compact")
+
+
+# Fast-path router: unambiguous requests skip the graph (and the LLM)
+ARITHMETIC_RE = re.compile(
+    r"^(?P<cue>(?:what(?:'s| is)|calculate|compute)\s+)?(?P<expr>[\d\s.+\-*/%()]+?)\s*(?P<end>[=?])?$", re.I
+)
+HAS_OPERATOR_RE = re.compile(r"\d\s*\)?\s*[-+*/%]")
+# Integers joined only by - or / look like phone numbers and dates ("555-1234",
+# "10/12"); they are only treated as arithmetic after an explicit cue
+DATE_OR_PHONE_RE = re.compile(r"^\d+(?:\s*[-/]\s*\d+)+$")
+PERCENT_RE = re.compile(r"^(?:what(?:'s| is)\s+)?(\d+(?:\.\d+)?)\s*%\s*of\s+(\d+(?:\.\d+)?)\s*\??$", re.I)
+DELAY = r"(?P<value>\d+(?:\.\d+)?)\s*(?P<unit>s|m|h|d|secs?|seconds?|mins?|minutes?|hrs?|hours?|days?)"
+REMINDER_RES = [
+    re.compile(rf"^remind me (?:in\s+)?{DELAY}\s+to\s+(?P<text>.+?)\.?$", re.I),
+    re.compile(rf"^remind me to\s+(?P<text>.+?)\s+in\s+{DELAY}\.?$", re.I),
+]
+
+
+def _fast_calculate(text: str):
+    match = PERCENT_RE.match(text)
+    if match:
+        expression = f"{match.group(1)} * {match.group(2)} / 100"
+    else:
+        match = ARITHMETIC_RE.match(text)
+        if not match or not HAS_OPERATOR_RE.search(match.group("expr")):
+            return None
+        expression = match.group("expr").strip()
+        if DATE_OR_PHONE_RE.match(expression) and not (match.group("cue") or match.group("end")):
+            return None
+
+    from tools.calculate import safe_eval
+    try:
+        safe_eval(expression)
+    except Exception:
+        return None
+    return f"{expression} = {get_tool('calculate').invoke({'expression': expression})}"
+
+
+def _fast_reminder(text: str, config: RunnableConfig):
+    for pattern in REMINDER_RES:
+        match = pattern.match(text)
+        if match:
+            break
+    else:
+        return None
+
+    value, unit = match.group("value"), match.group("unit").lower()
+    when = f"{value}{unit}" if len(unit) == 1 else f"{value} {unit}"
+    from tools.calendar import _parse_time
+    try:
+        _parse_time(when, pytz.UTC)
+    except ValueError:
+        return None
+
+    result = get_tool("set_reminder").invoke({"text": match.group("text"), "when": when}, config)
+    # Anything but a confirmation goes through the full graph
+    return result if result.startswith("✅") else None
+
+
+def is_trivial(text: str) -> bool:
+    """Whether fast_path() would likely answer `text`; has no side effects"""
+    text = text.strip()
+    if len(text) > 200:
+        return False
+    try:
+        return _fast_calculate(text) is not None or any(p.match(text) for p in REMINDER_RES)
+    except Exception:
+        return False
+
+
+def fast_path(text: str, config: RunnableConfig = None):
+    """
+    Answer trivial requests (plain arithmetic, "remind me in 5m to ...")
+    without the graph. Returns the reply, or None to use the full graph.
+    """
+    text = text.strip()
+    if len(text) > 200:
+        return None
+    try:
+        return _fast_calculate(text) or _fast_reminder(text, config)
+    except Exception as e:
+        logger.error(f"Fast path failed, using the graph: {e}")
+        return None
+
 
-# Compile agent WITHOUT checkpointer for simplicity
-# (Remove memory if you don't need conversation history across sessions)
-agent = workflow.compile()
\ No newline at end of file
+def build_agent(checkpointer=None):
+    """Compile the graph; pass a checkpointer to keep per-thread history"""
+    return workflow.compile(checkpointer=checkpointer)
\ No newline at end of file
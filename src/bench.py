@@ -0,0 +1,594 @@
+"""
+Offline benchmark and load test for the bot.
+
+Everything external is replaced by a local stand-in, so runs need no
+network and no API keys and are comparable across commits:
+
+- ChatOpenAI by ScriptedChatModel, which answers from the conversation
+  (tool call or plain reply) after a configurable, seeded latency
+- the Telegram Bot by FakeBot / FakeMessage, which only record calls
+- Wikipedia and DuckDuckGo by FixtureTransport, which serves recorded
+  responses from fixtures/http.json
+
+Workloads:
+
+    bot    each simulated chat sends messages through main.handle
+           (debouncer, dispatcher, fast path, graph, outbox) and waits for
+           the answer before its next message
+    agent  each chat calls the compiled agent directly, without Telegram
+
+Usage, from src/:
+
+    python bench.py --chats 20 --turns 5 --llm-latency 0.3 --json before.json
+    # ... change something ...
+    python bench.py --chats 20 --turns 5 --llm-latency 0.3 --compare before.json
+
+    # refresh the fixtures from the live APIs
+    python bench.py --record
+
+    # real LLM client (hedging, failover) against local stubs, see fake_openai.py
+    LLM_ENDPOINTS=http://127.0.0.1:8091/v1 OPENAI_API_KEY=stub python bench.py --live-llm
+
+    # cold-start guard: fails if `import main` exceeds the budget or pulls
+    # in a module that should only load on first use
+    python bench.py --imports --budget-ms 2000
+
+State (memory, notes, reminders) lives in a temporary directory that is
+removed afterwards.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Any, AsyncIterator, Optional
+
+import httpx
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+FIXTURES_PATH = Path(__file__).parent / "fixtures" / "http.json"
+
+# `import main` must not load these; they are imported on first use or in post_init
+DEFERRED_MODULES = (
+    "langchain_openai", "openai", "numpy", "aiosqlite", "langgraph.checkpoint.sqlite",
+    "tools.calculate", "tools.calendar", "tools.notes", "tools.wikipedia", "tools.websearch",
+)
+IMPORT_BUDGET_MS = 2000
+
+# (weight, message) pairs; the scripted model picks its tool from the wording
+WORKLOAD = [
+    (3, "hi, how are you today?"),
+    (2, "what's 17 * 23?"),
+    (1, "what's 15% of 80?"),
+    (1, "remind me in 10m to stretch"),
+    (2, "who was Ada Lovelace?"),
+    (1, "who was Alan Turing?"),
+    (1, "tell me about the Python programming language"),
+    (1, "how tall is Mount Everest?"),
+    (2, "search the web for python release schedule"),
+    (1, "search the web for weather in Paris"),
+    (1, "note: buy oat milk and coffee"),
+    (1, "find my notes about coffee"),
+    (1, "calculate (1234 + 5678) / 9 for me please"),
+]
+
+
+# Fake LLM
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Chat model stand-in that decides like the real agent would for the
+    benchmark workload: one tool call for a new question that needs one,
+    then a plain answer built from the tool result.
+
+    Latency is `latency` ± `jitter` seconds, seeded by the conversation,
+    so the same workload sleeps the same amount on every run.
+    """
+    latency: float = 0.3
+    jitter: float = 0.1
+    stream_delay: float = 0.005
+    seed: int = 0
+    model_name: str = "scripted"
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _delay(self, messages) -> float:
+        rng = random.Random(zlib.crc32(str(messages[-1].content).encode()) ^ self.seed)
+        return max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter))
+
+    def _respond(self, messages) -> AIMessage:
+        last = messages[-1]
+        prompt_tokens = sum(len(str(m.content)) for m in messages) // 4
+        if isinstance(last, ToolMessage):
+            content = f"Here is what I found: {str(last.content)[:300]}"
+            return _with_usage(AIMessage(content=content), prompt_tokens)
+
+        text = str(last.content).strip()
+        call = _pick_tool(text) if isinstance(last, HumanMessage) else None
+        if call is None:
+            content = "Sure! " + " ".join(["That is a good question, and here is a short answer."] * 3)
+            return _with_usage(AIMessage(content=content), prompt_tokens)
+        name, args = call
+        tool_call = {"name": name, "args": args, "id": f"call_{zlib.crc32(text.encode()):08x}"}
+        return _with_usage(AIMessage(content="", tool_calls=[tool_call]), prompt_tokens)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self._delay(messages))
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._delay(messages))
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _astream(
+        self,
+        messages,
+        stop=None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._delay(messages))
+        message = self._respond(messages)
+        if message.tool_calls:
+            chunks = [AIMessageChunk(content="", tool_call_chunks=[
+                {"name": tc["name"], "args": json.dumps(tc["args"]), "id": tc["id"], "index": i}
+                for i, tc in enumerate(message.tool_calls)
+            ])]
+        else:
+            words = message.content.split(" ")
+            chunks = [AIMessageChunk(content=word + " ") for word in words[:-1]]
+            chunks.append(AIMessageChunk(content=words[-1]))
+        chunks[-1].usage_metadata = message.usage_metadata
+
+        for chunk in chunks:
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=generation)
+            yield generation
+            if self.stream_delay:
+                await asyncio.sleep(self.stream_delay)
+
+
+def _with_usage(message: AIMessage, prompt_tokens: int) -> AIMessage:
+    completion_tokens = max(1, len(str(message.content)) // 4) + 10 * len(message.tool_calls)
+    message.usage_metadata = {
+        "input_tokens": prompt_tokens,
+        "output_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+    return message
+
+
+def _pick_tool(text: str):
+    lowered = text.lower().rstrip("?.! ")
+    if lowered.startswith("search the web for "):
+        return "web_search", {"query": text[len("search the web for "):].rstrip("?.! ")}
+    if lowered.startswith("note:"):
+        return "add_note", {"note": text[len("note:"):].strip()}
+    if lowered.startswith("find my notes about "):
+        return "search_notes", {"query": lowered[len("find my notes about "):]}
+    if lowered.startswith("calculate "):
+        return "calculate", {"expression": lowered[len("calculate "):].replace(" for me please", "")}
+    for prefix in ("who was ", "who is ", "tell me about the ", "tell me about ", "how tall is "):
+        if lowered.startswith(prefix):
+            return "wikipedia", {"query": lowered[len(prefix):]}
+    return None
+
+
+# Fake Telegram
+
+class FakeBot:
+    """Bot stand-in: every API call takes `latency` seconds and is counted"""
+
+    def __init__(self, latency: float = 0.02):
+        self.latency = latency
+        self.calls = {}
+        self.sent = {}
+
+    async def call(self, method: str, chat_id, text: str = None):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if text is not None:
+            self.sent.setdefault(chat_id, []).append(text)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def send_message(self, chat_id, text: str, **kwargs):
+        await self.call("sendMessage", chat_id, text)
+        return FakeMessage(self, chat_id, text)
+
+
+class FakeMessage:
+    _ids = iter(range(1, 2**31))
+
+    def __init__(self, bot: FakeBot, chat_id, text: str):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.text = text
+        self.message_id = next(FakeMessage._ids)
+
+    async def reply_text(self, text: str, **kwargs):
+        return await self.bot.send_message(self.chat_id, text)
+
+    async def edit_text(self, text: str, **kwargs):
+        await self.bot.call("editMessageText", self.chat_id, text)
+        self.text = text
+        return self
+
+    async def delete(self):
+        await self.bot.call("deleteMessage", self.chat_id)
+        return True
+
+
+class FakeUpdate:
+    def __init__(self, bot: FakeBot, chat_id, text: str):
+        self.message = FakeMessage(bot, chat_id, text)
+
+
+class FakeApplication:
+    def __init__(self, bot: FakeBot):
+        self.bot = bot
+
+
+# Recorded HTTP
+
+class FixtureTransport(httpx.AsyncBaseTransport, httpx.BaseTransport):
+    """
+    Serve recorded JSON responses per host, keyed by the host's query
+    parameter (normalized). Unrecorded queries get the host's default.
+    """
+
+    def __init__(self, fixtures: dict, latency: float = 0.05):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.requests = 0
+
+    def _response(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        host = self.fixtures.get(request.url.host)
+        if host is None:
+            return httpx.Response(404, json={"error": f"no fixtures for {request.url.host}"}, request=request)
+        query = " ".join(request.url.params.get(host["param"], "").lower().split())
+        return httpx.Response(200, json=host["responses"].get(query, host["default"]), request=request)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        time.sleep(self.latency)
+        return self._response(request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(self.latency)
+        return self._response(request)
+
+
+def install_fixtures(http_client, transport: FixtureTransport):
+    """Point the shared HTTP pools at `transport`"""
+    http_client._client = httpx.Client(transport=transport, headers=http_client.HEADERS)
+    http_client._async_client = httpx.AsyncClient(transport=transport, headers=http_client.HEADERS)
+
+
+def record_fixtures(path: Path = FIXTURES_PATH):
+    """Re-fetch every recorded query from the live APIs and save the responses"""
+    from tools import wikipedia, websearch
+
+    fixtures = json.loads(path.read_text())
+    endpoints = {
+        "en.wikipedia.org": (wikipedia.WIKIPEDIA_API, wikipedia._params),
+        "api.duckduckgo.com": (websearch.SEARCH_URL, websearch._params),
+    }
+    with httpx.Client(headers={"User-Agent": "Telegram-Gaia-Agent/1.0"}, timeout=10) as client:
+        for host, (url, params) in endpoints.items():
+            for query in fixtures[host]["responses"]:
+                fixtures[host]["responses"][query] = client.get(url, params=params(query)).json()
+                print(f"recorded {host} {query!r}")
+    path.write_text(json.dumps(fixtures, indent=2, ensure_ascii=False) + "\n")
+
+
+# Import time
+
+def import_time(module: str = "main", runs: int = 3) -> dict:
+    """
+    Cold-import `module` in fresh interpreters under -X importtime and keep
+    the fastest run. No OPENAI_API_KEY is set: importing must not need it.
+    """
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, cwd=Path(__file__).parent, env=env
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+        # "import time: self [us] | cumulative | imported package", children indented
+        rows = []
+        for line in proc.stderr.splitlines():
+            if line.startswith("import time:") and "cumulative" not in line:
+                _, cumulative_us, name = line.split("|")
+                rows.append((name[1:].rstrip(), int(cumulative_us)))
+        end = next(i for i, (name, _) in enumerate(rows) if name == module)
+        if best is None or rows[end][1] < best[0]:
+            best = (rows[end][1], rows, end)
+
+    total, rows, end = best
+    loaded = {name.strip() for name, _ in rows}
+    # Entries are listed children first, so the module's direct imports are the
+    # two-space-indented rows between the previous top-level entry and its own
+    start = end
+    while start > 0 and rows[start - 1][0].startswith(" "):
+        start -= 1
+    children = sorted(((name.strip(), us) for name, us in rows[start:end] if len(name) - len(name.lstrip()) == 2),
+                      key=lambda item: -item[1])
+    return {
+        "module": module,
+        "total_ms": total / 1000,
+        "direct_imports_ms": {name: us / 1000 for name, us in children[:10]},
+        "deferred_loaded": [m for m in DEFERRED_MODULES if m in loaded],
+    }
+
+
+def import_report(result: dict, budget_ms: float) -> str:
+    lines = [f"import {result['module']}: {result['total_ms']:.0f} ms (budget {budget_ms:.0f} ms)"]
+    for name, ms in result["direct_imports_ms"].items():
+        lines.append(f"  {name:<30} {ms:7.1f} ms")
+    if result["deferred_loaded"]:
+        lines.append(f"loaded at import but should be deferred: {', '.join(result['deferred_loaded'])}")
+    return "\n".join(lines)
+
+
+# Workloads
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+async def _bot_chat(main, bot: FakeBot, chat_id: int, turns: int, rng: random.Random, think: float,
+                    latencies: list, outcomes: dict):
+    for _ in range(turns):
+        text = rng.choices([m for _, m in WORKLOAD], weights=[w for w, _ in WORKLOAD])[0]
+        update = FakeUpdate(bot, chat_id, text)
+        finished = _waiters[update] = asyncio.Event()
+        start = time.perf_counter()
+        await main.handle(update, None)
+        await finished.wait()
+        latencies.append(time.perf_counter() - start)
+        last = (bot.sent.get(chat_id) or [""])[-1]
+        outcome = "busy" if last == main.BUSY_MESSAGE else "error" if last.startswith("An error occurred") else "ok"
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        del _waiters[update]
+        if think:
+            await asyncio.sleep(rng.uniform(0, 2 * think))
+
+
+# update -> Event set when its dispatch (run or rejection) has finished
+_waiters = {}
+
+
+def _track_dispatch(main):
+    original = main.dispatch
+
+    def finish(update):
+        event = _waiters.get(update)
+        if event is not None:
+            event.set()
+
+    async def dispatch(chat_id, texts, update, run_state):
+        # A superseded (cancelled) batch is re-dispatched with the newer fragment
+        try:
+            await original(chat_id, texts, update, run_state)
+        except Exception:
+            finish(update)
+            raise
+        finish(update)
+
+    main.dispatch = dispatch
+    # The debouncer holds a reference to the dispatch function it was built with
+    if main.debouncer is not None:
+        main.debouncer.flush = dispatch
+
+
+async def _agent_chat(graph, memory, chat_id: int, turns: int, rng: random.Random, think: float,
+                      latencies: list, outcomes: dict):
+    for _ in range(turns):
+        text = rng.choices([m for _, m in WORKLOAD], weights=[w for w, _ in WORKLOAD])[0]
+        start = time.perf_counter()
+        try:
+            await graph.ainvoke({"messages": [HumanMessage(content=text)]}, memory.thread_config(chat_id))
+            outcomes["ok"] = outcomes.get("ok", 0) + 1
+        except Exception:
+            outcomes["error"] = outcomes.get("error", 0) + 1
+        latencies.append(time.perf_counter() - start)
+        if think:
+            await asyncio.sleep(rng.uniform(0, 2 * think))
+
+
+async def run(args) -> dict:
+    # Imported here so the environment set up by main() applies to them
+    import agent as agent_module
+    import main
+    import memory
+    import metrics
+    from tools import http_client
+
+    if not args.live_llm:
+        model = ScriptedChatModel(latency=args.llm_latency, jitter=args.llm_jitter, seed=args.seed)
+        agent_module.llm = model
+        agent_module.llm_with_tools = model
+    transport = FixtureTransport(json.loads(FIXTURES_PATH.read_text()), latency=args.http_latency)
+    install_fixtures(http_client, transport)
+
+    bot = FakeBot(latency=args.telegram_latency)
+    main.STREAM_REPLIES = args.stream
+    main.DEBOUNCE_SECONDS = args.debounce
+    await main.post_init(FakeApplication(bot))
+    _track_dispatch(main)
+
+    latencies = []
+    outcomes = {}
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    try:
+        if args.target == "bot":
+            chats = [_bot_chat(main, bot, 1000 + i, args.turns, random.Random(args.seed + i), args.think,
+                               latencies, outcomes) for i in range(args.chats)]
+        else:
+            chats = [_agent_chat(main.agent, memory, 1000 + i, args.turns, random.Random(args.seed + i),
+                                 args.think, latencies, outcomes) for i in range(args.chats)]
+        await asyncio.gather(*chats)
+        elapsed = time.perf_counter() - start
+    finally:
+        await main.post_shutdown(None)
+
+    nodes = {
+        dict(labels).get("node") or dict(labels).get("tool"): {"p50": p50, "p95": p95, "p99": p99, "count": count}
+        for name in ("gaia_node_seconds", "gaia_tool_seconds")
+        for labels, (p50, p95, p99, count) in metrics.percentiles(name).items()
+    }
+    return {
+        "commit": _commit(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("json", "compare", "record")},
+        "turns": len(latencies),
+        "outcomes": outcomes,
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "latency": {
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "p99": _percentile(latencies, 99),
+            "max": max(latencies, default=0.0),
+        },
+        "stages": nodes,
+        "llm_tokens": {
+            "prompt": metrics.counter("gaia_llm_tokens_total", kind="prompt"),
+            "completion": metrics.counter("gaia_llm_tokens_total", kind="completion"),
+        },
+        "llm_router": agent_module.llm_stats(),
+        "telegram_calls": bot.calls,
+        "http_requests": transport.requests,
+        "memory": {"rss_before_mb": rss_before, "peak_rss_mb": _rss_mb()},
+    }
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+            cwd=Path(__file__).parent, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def report(result: dict, baseline: dict = None) -> str:
+    p = result["params"]
+    latency = result["latency"]
+    lines = [
+        f"gaia bench @ {result['commit']}: target={p['target']} chats={p['chats']} turns={p['turns']} "
+        f"llm={p['llm_latency']}s±{p['llm_jitter']} http={p['http_latency']}s telegram={p['telegram_latency']}s",
+        f"turns: {result['turns']} {result['outcomes']} in {result['elapsed']:.2f}s "
+        f"-> {result['throughput']:.2f} turns/s",
+        f"latency: p50 {latency['p50']:.3f}s  p95 {latency['p95']:.3f}s  "
+        f"p99 {latency['p99']:.3f}s  max {latency['max']:.3f}s",
+    ]
+    for stage, s in sorted(result["stages"].items()):
+        lines.append(f"  {stage:<15} p50 {s['p50']:.3f}s  p95 {s['p95']:.3f}s  p99 {s['p99']:.3f}s  ({s['count']})")
+    tokens = result["llm_tokens"]
+    lines.append(f"llm tokens: {tokens['prompt']:.0f} prompt, {tokens['completion']:.0f} completion; "
+                 f"http requests: {result['http_requests']}; telegram calls: {result['telegram_calls']}")
+    if result["llm_router"]:
+        lines.append(f"llm router: {result['llm_router']}")
+    lines.append(f"memory: peak rss {result['memory']['peak_rss_mb']:.1f} MB "
+                 f"(started at {result['memory']['rss_before_mb']:.1f} MB)")
+
+    if baseline:
+        lines.append(f"vs {baseline['commit']}:")
+        rows = [
+            ("throughput", baseline["throughput"], result["throughput"], "turns/s"),
+            ("p50", baseline["latency"]["p50"], latency["p50"], "s"),
+            ("p95", baseline["latency"]["p95"], latency["p95"], "s"),
+            ("p99", baseline["latency"]["p99"], latency["p99"], "s"),
+            ("peak rss", baseline["memory"]["peak_rss_mb"], result["memory"]["peak_rss_mb"], "MB"),
+        ]
+        for label, old, new, unit in rows:
+            change = f"{(new - old) / old:+.1%}" if old else "n/a"
+            lines.append(f"  {label:<10} {old:.3f} -> {new:.3f} {unit} ({change})")
+        differing = [k for k, v in baseline["params"].items() if k in p and p[k] != v]
+        if differing:
+            lines.append(f"  warning: parameters differ from the baseline run: {', '.join(differing)}")
+    return "\n".join(lines)
+
+
+def main():
+    cli = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    cli.add_argument("--target", choices=("bot", "agent"), default="bot")
+    cli.add_argument("--chats", type=int, default=20, help="concurrent chats")
+    cli.add_argument("--turns", type=int, default=5, help="messages per chat")
+    cli.add_argument("--think", type=float, default=0.2, help="mean pause between a reply and the next message")
+    cli.add_argument("--llm-latency", type=float, default=0.3)
+    cli.add_argument("--llm-jitter", type=float, default=0.1)
+    cli.add_argument("--http-latency", type=float, default=0.05)
+    cli.add_argument("--telegram-latency", type=float, default=0.02)
+    cli.add_argument("--debounce", type=float, default=0.0, help="DEBOUNCE_SECONDS for the bot workload")
+    cli.add_argument("--stream", action=argparse.BooleanOptionalAction, default=False, help="stream replies")
+    cli.add_argument("--seed", type=int, default=1)
+    cli.add_argument("--live-llm", action="store_true",
+                     help="use the configured LLM endpoints (e.g. fake_openai.py stubs) instead of the scripted model")
+    cli.add_argument("--json", help="write the results to this file")
+    cli.add_argument("--compare", help="results file of an earlier run to compare against")
+    cli.add_argument("--record", action="store_true", help="refresh fixtures/http.json from the live APIs")
+    cli.add_argument("--imports", action="store_true", help="measure the cold import time of main")
+    cli.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS, help="import time budget for --imports")
+    args = cli.parse_args()
+
+    if args.record:
+        record_fixtures()
+        return
+    if args.imports:
+        result = import_time()
+        print(import_report(result, args.budget_ms))
+        if args.json:
+            Path(args.json).write_text(json.dumps(result, indent=2) + "\n")
+        if result["total_ms"] > args.budget_ms or result["deferred_loaded"]:
+            sys.exit(1)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="gaia-bench-") as state_dir:
+        os.environ["MEMORY_DB_PATH"] = os.path.join(state_dir, "memory.sqlite")
+        os.environ["NOTES_DB_PATH"] = os.path.join(state_dir, "notes.sqlite")
+        os.environ["REMINDERS_DB_PATH"] = os.path.join(state_dir, "reminders.sqlite")
+        os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+        import logging
+        logging.disable(logging.WARNING)
+        result = asyncio.run(run(args))
+
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print(report(result, baseline))
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Token-budget-aware history compaction.
+
+History is handled in whole turns (a HumanMessage plus everything up to the
+next one), so an AIMessage with tool calls always stays with its
+ToolMessages. Once history passes COMPACT_TRIGGER_TOKENS or the stored
+message cap, every turn outside the newest HISTORY_TOKEN_BUDGET tokens is
+folded into a running summary, which is updated incrementally instead of
+being rebuilt. Until then the whole history goes into the prompt, so a turn
+is always either in the prompt or in the summary.
+"""
+import os
+import json
+import logging
+from functools import lru_cache
+from langchain_core.messages import SystemMessage, HumanMessage, RemoveMessage
+from memory import MAX_STORED_MESSAGES
+
+logger = logging.getLogger(__name__)
+
+# History beyond COMPACT_TRIGGER_TOKENS (or MAX_STORED_MESSAGES messages) is
+# summarized down to the newest HISTORY_TOKEN_BUDGET tokens (and half the
+# message cap); the gap between the two keeps summary calls infrequent
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "3000"))
+COMPACT_TRIGGER_TOKENS = int(os.environ.get("COMPACT_TRIGGER_TOKENS", "6000"))
+SUMMARY_MAX_WORDS = 200
+TOKENIZER_MODEL = "gpt-4o-mini"
+
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD = 4
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a user and the assistant Gaia.
+
+Current summary:
+{summary}
+
+New messages to fold in:
+{transcript}
+
+Write the updated summary in at most {max_words} words. Keep facts, names, numbers, user preferences and open tasks; drop small talk."""
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(TOKENIZER_MODEL)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except ImportError:
+        logger.warning("tiktoken not installed; estimating tokens as len/4")
+    except Exception as e:
+        # The encoding is downloaded on first use and may be unreachable
+        logger.warning(f"tiktoken encoding unavailable ({e}); estimating tokens as len/4")
+    return None
+
+
+@lru_cache(maxsize=8192)
+def count_text(text: str) -> int:
+    """Token count of a string (cached, since history is re-counted every turn)"""
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message(message) -> int:
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    tokens = MESSAGE_OVERHEAD + count_text(content)
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        tokens += count_text(tool_call["name"]) + count_text(json.dumps(tool_call["args"], sort_keys=True))
+    return tokens
+
+
+def count_messages(messages: list) -> int:
+    return sum(count_message(m) for m in messages)
+
+
+def split_turns(messages: list) -> list:
+    """Group non-system messages into turns, each starting at a HumanMessage"""
+    turns = []
+    for m in messages:
+        if isinstance(m, SystemMessage):
+            continue
+        if isinstance(m, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(m)
+    return turns
+
+
+def select_recent(messages: list, budget: int = HISTORY_TOKEN_BUDGET, max_messages: int = None) -> list:
+    """
+    Newest whole turns that fit in `budget` tokens (and `max_messages`
+    messages, if given).
+
+    The latest turn is always kept, even if it alone exceeds the limits.
+    """
+    turns = split_turns(messages)
+    kept = []
+    used = 0
+    count = 0
+    for turn in reversed(turns):
+        tokens = count_messages(turn)
+        if kept and (used + tokens > budget or (max_messages and count + len(turn) > max_messages)):
+            break
+        kept.insert(0, turn)
+        used += tokens
+        count += len(turn)
+    return [m for turn in kept for m in turn]
+
+
+def needs_compaction(messages: list) -> bool:
+    history = [m for m in messages if not isinstance(m, SystemMessage)]
+    return len(history) > MAX_STORED_MESSAGES or count_messages(history) > COMPACT_TRIGGER_TOKENS
+
+
+def _transcript(messages: list) -> str:
+    lines = []
+    for m in messages:
+        if getattr(m, "tool_calls", None):
+            calls = ", ".join(f"{tc['name']}({json.dumps(tc['args'])})" for tc in m.tool_calls)
+            lines.append(f"assistant called: {calls}")
+        if m.content:
+            lines.append(f"{m.type}: {m.content}")
+    return "\n".join(lines)
+
+
+async def compact(messages: list, summary: str, llm) -> dict:
+    """
+    State update that folds old turns into the summary.
+
+    Returns {} while history is under COMPACT_TRIGGER_TOKENS and
+    MAX_STORED_MESSAGES, otherwise the new summary plus RemoveMessage
+    entries for the folded messages.
+    """
+    if not needs_compaction(messages):
+        return {}
+
+    recent = {id(m) for m in select_recent(messages, max_messages=MAX_STORED_MESSAGES // 2)}
+    old = [m for m in messages if id(m) not in recent and not isinstance(m, SystemMessage)]
+    if not old:
+        return {}
+
+    prompt = SUMMARY_PROMPT.format(
+        summary=summary or "(empty)",
+        transcript=_transcript(old),
+        max_words=SUMMARY_MAX_WORDS
+    )
+    try:
+        response = await llm.ainvoke([HumanMessage(content=prompt)])
+    except Exception as e:
+        # Keep the full history rather than losing turns without a summary
+        logger.error(f"History compaction failed: {e}")
+        return {}
+
+    logger.info(f"Compacted {len(old)} messages into the running summary")
+    return {
+        "summary": response.content,
+        "messages": [RemoveMessage(id=m.id) for m in old if m.id],
+    }
@@ -0,0 +1,150 @@
+"""
+Admission control for agent runs.
+
+Runs for different chats proceed concurrently, runs for one chat are
+serialized in arrival order, at most MAX_CONCURRENT_RUNS execute at once,
+at most MAX_WAITING_RUNS may wait for a slot, and at most
+MAX_WAITING_PER_CHAT of those may belong to one chat. Anything beyond that
+is rejected immediately so the caller can answer "busy" instead of
+queueing unbounded work (one flooding chat cannot fill the whole queue).
+"""
+import os
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_RUNS = int(os.environ.get("MAX_CONCURRENT_RUNS", "8"))
+MAX_WAITING_RUNS = int(os.environ.get("MAX_WAITING_RUNS", "32"))
+MAX_WAITING_PER_CHAT = int(os.environ.get("MAX_WAITING_PER_CHAT", "2"))
+
+
+class ChatDispatcher:
+    def __init__(self, max_running: int = MAX_CONCURRENT_RUNS, max_waiting: int = MAX_WAITING_RUNS,
+                 max_waiting_per_chat: int = MAX_WAITING_PER_CHAT):
+        self.max_running = max_running
+        self.max_waiting = max_waiting
+        self.max_waiting_per_chat = max_waiting_per_chat
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._slots = asyncio.Semaphore(max_running)
+        # chat_id -> [lock, number of runs holding or waiting for it]
+        self._chats = {}
+
+    async def submit(self, chat_id, run) -> bool:
+        """
+        Await `run()` once the chat is free and a slot is available.
+        Returns False without running it when the wait queue, or this
+        chat's share of it, is full.
+        """
+        if self.waiting >= self.max_waiting:
+            self.rejected += 1
+            logger.warning(f"Dispatcher full ({self.running} running, {self.waiting} waiting); rejecting chat {chat_id}")
+            return False
+        entry = self._chats.get(chat_id)
+        if entry is not None and entry[1] - entry[0].locked() >= self.max_waiting_per_chat:
+            # The run holding the chat's lock is not queued; the others are
+            self.rejected += 1
+            logger.warning(f"Chat {chat_id} already has {self.max_waiting_per_chat} runs waiting; rejecting")
+            return False
+
+        self.waiting += 1
+        entry = self._chats.setdefault(chat_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        admitted = False
+        try:
+            # asyncio.Lock wakes waiters in FIFO order, keeping per-chat ordering
+            async with entry[0]:
+                async with self._slots:
+                    self.waiting -= 1
+                    admitted = True
+                    self.running += 1
+                    try:
+                        await run()
+                    finally:
+                        self.running -= 1
+        finally:
+            if not admitted:
+                self.waiting -= 1
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chats[chat_id]
+        return True
+
+    def stats(self) -> dict:
+        return {"running": self.running, "waiting": self.waiting, "rejected": self.rejected}
+
+
+class Debouncer:
+    """
+    Coalesce rapid consecutive messages from one chat.
+
+    Fragments arriving within `window` seconds of each other are flushed
+    together as one batch. A fragment that arrives while the previous
+    batch is still running supersedes it (the run is cancelled and its
+    fragments re-sent with the new one), unless that run has already
+    committed, i.e. set `state["committed"]` because a side effect such
+    as a tool call or the final reply happened.
+    """
+
+    def __init__(self, window: float, flush):
+        # flush(chat_id, texts, update, state) is awaited for each batch
+        self.window = window
+        self.flush = flush
+        self.coalesced = 0
+        self.superseded = 0
+        self._entries = {}
+        self._tasks = set()
+
+    def add(self, chat_id, text: str, update, immediate: bool = False):
+        """
+        Queue a fragment. With `immediate`, a fragment that starts a new
+        batch is flushed without waiting for the window (e.g. one the fast
+        path answers in milliseconds).
+        """
+        entry = self._entries.get(chat_id)
+        if entry is not None and entry["state"]["committed"]:
+            # Let the committed run finish; this fragment starts a new batch
+            entry = None
+
+        if entry is None:
+            entry = {"texts": [], "update": None, "task": None, "state": None}
+            self._entries[chat_id] = entry
+        else:
+            self.coalesced += 1
+            if entry["state"]["started"]:
+                self.superseded += 1
+            entry["task"].cancel()
+
+        entry["texts"].append(text)
+        entry["update"] = update
+        entry["state"] = {"started": False, "committed": False}
+        delay = 0 if immediate and len(entry["texts"]) == 1 else self.window
+        entry["task"] = asyncio.create_task(self._run(chat_id, entry, entry["state"], delay))
+        self._tasks.add(entry["task"])
+        entry["task"].add_done_callback(self._tasks.discard)
+
+    async def _run(self, chat_id, entry, state, delay: float):
+        try:
+            await asyncio.sleep(delay)
+            state["started"] = True
+            await self.flush(chat_id, list(entry["texts"]), entry["update"], state)
+        finally:
+            if self._entries.get(chat_id) is entry and entry["state"] is state:
+                del self._entries[chat_id]
+
+    async def drain(self, timeout: float):
+        """Wait up to `timeout` seconds for pending batches and their runs to finish"""
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=timeout)
+
+    async def close(self):
+        """Cancel pending batches and wait for their runs to unwind"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"coalesced": self.coalesced, "superseded": self.superseded}
@@ -0,0 +1,126 @@
+"""
+Local stand-in for an OpenAI-compatible chat completions endpoint, for
+exercising LLM hedging and failover (see llm_router.py) without the API.
+
+Every request waits `--latency` ± `--jitter` seconds; with probability
+`--stall-rate` it waits `--stall` seconds instead, and with probability
+`--fail-rate` it answers HTTP 500. Answers are plain text naming the
+endpoint, so the log shows which one won. Streaming requests are answered
+as server-sent events.
+
+Usage, from src/:
+
+    # a primary that stalls 20% of the time and a fast local fallback
+    python fake_openai.py --port 8091 --name primary --latency 0.5 --stall-rate 0.2 --stall 30
+    python fake_openai.py --port 8092 --name fallback --latency 0.2
+
+    LLM_ENDPOINTS=http://127.0.0.1:8091/v1 OPENAI_API_KEY=stub \\
+    LLM_FALLBACK_MODEL=local LLM_FALLBACK_BASE_URL=http://127.0.0.1:8092/v1 \\
+    LLM_TIMEOUT=5 python bench.py --live-llm
+"""
+import argparse
+import itertools
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_ids = itertools.count(1)
+
+
+def _completion(name: str, model: str, content: str) -> dict:
+    return {
+        "id": f"chatcmpl-{name}-{next(_ids)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 10, "completion_tokens": len(content) // 4, "total_tokens": 10 + len(content) // 4},
+    }
+
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason=None) -> dict:
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def make_handler(args):
+    class ChatCompletionsHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            messages = request.get("messages") or [{}]
+            prompt = str(messages[-1].get("content", ""))
+            model = request.get("model", "stub")
+
+            if random.random() < args.stall_rate:
+                delay = args.stall
+            else:
+                delay = max(0.0, args.latency + random.uniform(-args.jitter, args.jitter))
+            print(f"{args.name}: {model} request, answering in {delay:.2f}s", flush=True)
+            time.sleep(delay)
+
+            if random.random() < args.fail_rate:
+                return self._send(500, {"error": {"message": f"{args.name} failed", "type": "server_error"}})
+
+            content = f"[{args.name}] stub answer to: {prompt[:80]}"
+            completion = _completion(args.name, model, content)
+            if request.get("stream"):
+                return self._stream(completion, model)
+            self._send(200, completion)
+
+        def _send(self, status: int, payload: dict):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stream(self, completion: dict, model: str):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            content = completion["choices"][0]["message"]["content"]
+            events = [_chunk(completion["id"], model, {"role": "assistant", "content": ""})]
+            events += [_chunk(completion["id"], model, {"content": word + " "}) for word in content.split(" ")]
+            events.append(_chunk(completion["id"], model, {}, finish_reason="stop"))
+            final = dict(events[-1], choices=[], usage=completion["usage"])
+            for event in events + [final]:
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+        def log_message(self, format, *args):
+            pass
+
+    return ChatCompletionsHandler
+
+
+def serve(args):
+    print(f"Fake OpenAI endpoint '{args.name}' on http://{args.host}:{args.port}/v1", flush=True)
+    ThreadingHTTPServer((args.host, args.port), make_handler(args)).serve_forever()
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    cli.add_argument("--host", default="127.0.0.1")
+    cli.add_argument("--port", type=int, default=8091)
+    cli.add_argument("--name", default="stub")
+    cli.add_argument("--latency", type=float, default=0.5)
+    cli.add_argument("--jitter", type=float, default=0.1)
+    cli.add_argument("--stall-rate", type=float, default=0.0)
+    cli.add_argument("--stall", type=float, default=30.0)
+    cli.add_argument("--fail-rate", type=float, default=0.0)
+    serve(cli.parse_args())
@@ -0,0 +1,119 @@
+"""
+Local stand-in for the Telegram Bot API, for exercising webhook mode.
+
+It answers the Bot API methods the bot uses (getMe, setWebhook,
+sendMessage, editMessageText, deleteMessage, ...) and prints every call,
+and it can POST fake updates to the bot's webhook.
+
+Usage, from src/:
+
+    # 1. start the fake API server
+    python fake_telegram.py serve --port 8081
+
+    # 2. start the bot in webhook mode against it
+    TELEGRAM_BOT_TOKEN=123:test TELEGRAM_API_BASE_URL=http://127.0.0.1:8081/bot \\
+    BOT_MODE=webhook WEBHOOK_URL=http://127.0.0.1:8443 WEBHOOK_SECRET=s3cret \\
+    python main.py
+
+    # 3. deliver messages as chat 42; replies show up in the server's output
+    python fake_telegram.py send "what's 15% of 80?" --chat 42 --secret s3cret
+    python fake_telegram.py send /status --chat 42 --secret s3cret
+
+A wrong or missing --secret is rejected by the bot with HTTP 403.
+"""
+import argparse
+import itertools
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import httpx
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Gaia", "username": "gaia_test_bot"}
+_message_ids = itertools.count(1)
+
+
+def _message(chat_id, text: str, message_id: int = None) -> dict:
+    return {
+        "message_id": message_id or next(_message_ids),
+        "date": int(time.time()),
+        "chat": {"id": int(chat_id), "type": "private"},
+        "from": BOT_USER,
+        "text": text,
+    }
+
+
+def _answer(method: str, params: dict):
+    if method == "getMe":
+        return BOT_USER
+    if method == "sendMessage":
+        return _message(params["chat_id"], params.get("text", ""))
+    if method == "editMessageText":
+        return _message(params["chat_id"], params.get("text", ""), int(params["message_id"]))
+    if method == "getUpdates":
+        return []
+    # setWebhook, deleteWebhook, deleteMessage, ...
+    return True
+
+
+class BotApiHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        method = self.path.rstrip("/").rsplit("/", 1)[-1]
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            params = json.loads(body or "{}")
+        else:
+            params = {k: v[0] for k, v in parse_qs(body).items()}
+
+        print(f"{method} {json.dumps(params, ensure_ascii=False)}", flush=True)
+        payload = json.dumps({"ok": True, "result": _answer(method, params)}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host: str, port: int):
+    print(f"Fake Telegram Bot API on http://{host}:{port}/bot", flush=True)
+    ThreadingHTTPServer((host, port), BotApiHandler).serve_forever()
+
+
+def make_update(update_id: int, chat_id: int, text: str) -> dict:
+    message = _message(chat_id, text, update_id)
+    message["from"] = {"id": chat_id, "is_bot": False, "first_name": "Tester"}
+    if text.startswith("/"):
+        command = text.split()[0]
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+    return {"update_id": update_id, "message": message}
+
+
+def send(webhook: str, secret: str, chat_id: int, text: str):
+    update = make_update(int(time.time() * 1000) % 2**31, chat_id, text)
+    response = httpx.post(webhook, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": secret or ""})
+    print(f"{response.status_code} {response.text}")
+
+
+if __name__ == "__main__":
+    cli = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = cli.add_subparsers(dest="command", required=True)
+    serve_cmd = commands.add_parser("serve", help="run the fake Bot API server")
+    serve_cmd.add_argument("--host", default="127.0.0.1")
+    serve_cmd.add_argument("--port", type=int, default=8081)
+    send_cmd = commands.add_parser("send", help="POST a text message update to the bot's webhook")
+    send_cmd.add_argument("text")
+    send_cmd.add_argument("--chat", type=int, default=42)
+    send_cmd.add_argument("--webhook", default="http://127.0.0.1:8443/telegram")
+    send_cmd.add_argument("--secret")
+    args = cli.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port)
+    else:
+        send(args.webhook, args.secret, args.chat, args.text)
@@ -0,0 +1,93 @@
+"""
+Opt-in response cache in front of the agent's LLM call.
+
+Entries are keyed on the model name, the bound tool schemas and the
+normalized message list, and live in an in-memory LRU with an optional
+SQLite tier. Enable with LLM_CACHE_ENABLED=1.
+"""
+import os
+import json
+import uuid
+import hashlib
+import logging
+from langchain_core.messages import message_to_dict, messages_from_dict, ToolMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from tools.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("LLM_CACHE_ENABLED", "0").lower() in ("1", "true", "yes")
+CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", "3600"))
+CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", "1024"))
+CACHE_PATH = os.environ.get("LLM_CACHE_PATH") or None
+
+# Answers involving these tools depend on the clock, so they are never
+# served from or written to the cache
+BYPASS_TOOLS = {"set_reminder", "set_recurring_reminder", "get_current_time", "list_reminders"}
+
+cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL, path=CACHE_PATH if ENABLED else None, name="llm")
+
+
+def tools_fingerprint(tools: list) -> str:
+    """Stable hash of the tool schemas bound to the model"""
+    schemas = [convert_to_openai_tool(t) for t in tools]
+    return hashlib.sha256(json.dumps(schemas, sort_keys=True).encode()).hexdigest()
+
+
+def _normalize(message) -> dict:
+    content = message.content
+    if isinstance(content, str):
+        content = " ".join(content.split())
+    entry = {"type": message.type, "content": content}
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        entry["tool_calls"] = [{"name": tc["name"], "args": tc["args"]} for tc in tool_calls]
+    if isinstance(message, ToolMessage):
+        entry["name"] = message.name
+    return entry
+
+
+def make_key(model: str, fingerprint: str, messages: list) -> str:
+    payload = json.dumps([model, fingerprint, [_normalize(m) for m in messages]], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _current_turn_tools(messages: list) -> set:
+    names = set()
+    for m in reversed(messages):
+        if m.type == "human":
+            break
+        names.update(tc["name"] for tc in getattr(m, "tool_calls", None) or [])
+        if isinstance(m, ToolMessage):
+            names.add(m.name)
+    return names
+
+
+def bypass(messages: list) -> bool:
+    """True when the current turn already involves a time-sensitive tool"""
+    return bool(_current_turn_tools(messages) & BYPASS_TOOLS)
+
+
+async def lookup(key: str):
+    """Cached AIMessage for `key`, or None"""
+    data = await cache.aget(key)
+    if data is None:
+        return None
+    message = messages_from_dict([data])[0]
+    # Fresh ids, so a replayed answer is appended rather than merged into an
+    # earlier copy by add_messages, and tool results pair with this call
+    message.id = None
+    for tool_call in message.tool_calls or []:
+        tool_call["id"] = f"call_{uuid.uuid4().hex[:24]}"
+    return message
+
+
+async def store(key: str, response):
+    """Cache `response` unless it calls a time-sensitive tool"""
+    if any(tc["name"] in BYPASS_TOOLS for tc in getattr(response, "tool_calls", None) or []):
+        return
+    await cache.aset(key, message_to_dict(response))
+
+
+def stats() -> dict:
+    return {**cache.stats(), "enabled": ENABLED}
@@ -0,0 +1,243 @@
+"""
+Latency-aware LLM client: hedged requests, per-endpoint routing and failover.
+
+Endpoints are OpenAI-compatible chat models in two tiers: the primary model
+(one or more base URLs) and an optional cheaper or local fallback model.
+
+- Each call goes to the healthy primary endpoint with the lowest latency
+  EWMA.
+- If no answer arrives within that endpoint's recent p95 latency (clamped
+  to [LLM_HEDGE_MIN_DELAY, LLM_HEDGE_MAX_DELAY]), a duplicate request is
+  sent to the next-best primary endpoint (or the same one) and the first
+  answer wins.
+- If the primary tier fails or takes longer than LLM_TIMEOUT, the request
+  fails over to the fallback tier.
+- Endpoints that fail repeatedly sit out for LLM_COOLDOWN seconds.
+
+The clients do not retry themselves (max_retries=0); hedging and failover
+replace retries, so a stuck request costs at most LLM_TIMEOUT plus
+LLM_FALLBACK_TIMEOUT. Point LLM_ENDPOINTS / LLM_FALLBACK_BASE_URL at local
+stubs (see fake_openai.py) to exercise all of this offline.
+"""
+import os
+import time
+import asyncio
+import logging
+from urllib.parse import urlparse
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+LLM_MODEL = os.environ.get("LLM_MODEL", "gpt-4o-mini")
+# Comma-separated base URLs serving LLM_MODEL; empty means the OpenAI default
+LLM_ENDPOINTS = [url.strip() for url in os.environ.get("LLM_ENDPOINTS", "").split(",") if url.strip()]
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "20"))
+
+LLM_FALLBACK_MODEL = os.environ.get("LLM_FALLBACK_MODEL")
+LLM_FALLBACK_BASE_URL = os.environ.get("LLM_FALLBACK_BASE_URL")
+LLM_FALLBACK_API_KEY = os.environ.get("LLM_FALLBACK_API_KEY")
+LLM_FALLBACK_TIMEOUT = float(os.environ.get("LLM_FALLBACK_TIMEOUT", "20"))
+
+LLM_HEDGE = os.environ.get("LLM_HEDGE", "1").lower() in ("1", "true", "yes")
+LLM_HEDGE_QUANTILE = float(os.environ.get("LLM_HEDGE_QUANTILE", "95"))
+LLM_HEDGE_MIN_DELAY = float(os.environ.get("LLM_HEDGE_MIN_DELAY", "1"))
+LLM_HEDGE_MAX_DELAY = float(os.environ.get("LLM_HEDGE_MAX_DELAY", "10"))
+# Hedge delay until an endpoint has enough samples for a percentile
+LLM_HEDGE_DEFAULT_DELAY = float(os.environ.get("LLM_HEDGE_DEFAULT_DELAY", "4"))
+HEDGE_MIN_SAMPLES = 20
+
+EWMA_ALPHA = 0.2
+MAX_FAILURES = 3
+LLM_COOLDOWN = float(os.environ.get("LLM_COOLDOWN", "30"))
+
+
+class Endpoint:
+    def __init__(self, name: str, model, tier: int = 0):
+        self.name = name
+        self.model = model
+        self.tier = tier
+        self.ewma = None
+        self.latency = metrics.Histogram()
+        self.failures = 0
+        self.cooldown_until = 0.0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def hedge_delay(self) -> float:
+        if self.latency.count < HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT_DELAY
+        return min(LLM_HEDGE_MAX_DELAY, max(LLM_HEDGE_MIN_DELAY, self.latency.percentile(LLM_HEDGE_QUANTILE)))
+
+    def _update_ewma(self, seconds: float):
+        self.ewma = seconds if self.ewma is None else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * self.ewma
+
+    def succeeded(self, seconds: float):
+        self.failures = 0
+        self.latency.observe(seconds)
+        self._update_ewma(seconds)
+        metrics.observe("gaia_llm_endpoint_seconds", seconds, endpoint=self.name)
+
+    def abandoned(self, seconds: float):
+        # A cancelled request took at least `seconds`; only let that raise the
+        # estimate. An unmeasured endpoint is seeded with it, or it would keep
+        # sorting first (as 0) however often it gets out-raced.
+        if self.ewma is None or seconds > self.ewma:
+            self._update_ewma(seconds)
+
+    def failed(self, seconds: float):
+        self.failures += 1
+        self._update_ewma(max(seconds, self.ewma or 0.0))
+        metrics.inc("gaia_llm_endpoint_errors_total", endpoint=self.name)
+        if self.failures >= MAX_FAILURES:
+            self.cooldown_until = time.monotonic() + LLM_COOLDOWN
+            logger.warning(f"LLM endpoint {self.name} failed {self.failures} times; cooling down for {LLM_COOLDOWN}s")
+
+    def bind_tools(self, tools, **kwargs) -> "Endpoint":
+        return Endpoint(self.name, self.model.bind_tools(tools, **kwargs), self.tier)
+
+
+class LLMRouter:
+    """
+    Drop-in for a chat model's `ainvoke` that hedges and fails over across
+    endpoints. bind_tools() returns a router over the tool-bound models,
+    sharing nothing but the configuration.
+    """
+
+    def __init__(self, endpoints: list, hedge: bool = LLM_HEDGE,
+                 timeout: float = LLM_TIMEOUT, fallback_timeout: float = LLM_FALLBACK_TIMEOUT):
+        if not endpoints:
+            raise ValueError("LLMRouter needs at least one endpoint")
+        self.endpoints = endpoints
+        self.hedge = hedge
+        self.timeout = timeout
+        self.fallback_timeout = fallback_timeout
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    @property
+    def model_name(self) -> str:
+        return getattr(self.endpoints[0].model, "model_name", self.endpoints[0].name)
+
+    def bind_tools(self, tools, **kwargs) -> "LLMRouter":
+        return LLMRouter([e.bind_tools(tools, **kwargs) for e in self.endpoints],
+                         self.hedge, self.timeout, self.fallback_timeout)
+
+    def _route(self):
+        """(primary tier, fallback tier), each healthy endpoint first and fastest first"""
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if e.healthy(now)] or self.endpoints
+        # Unmeasured endpoints sort first so each gets tried
+        candidates = sorted(candidates, key=lambda e: (e.tier, e.ewma or 0.0))
+        best_tier = candidates[0].tier
+        return [e for e in candidates if e.tier == best_tier], [e for e in candidates if e.tier != best_tier]
+
+    async def ainvoke(self, messages, config=None):
+        primary, fallback = self._route()
+        try:
+            return await self._tier(primary, messages, config, self.timeout)
+        except Exception as e:
+            if not fallback:
+                raise
+            self.failovers += 1
+            metrics.inc("gaia_llm_failovers_total")
+            reason = "timed out" if isinstance(e, asyncio.TimeoutError) else f"failed ({e})"
+            logger.warning(f"LLM endpoint {primary[0].name} {reason}; failing over to {fallback[0].name}")
+            return await self._tier(fallback, messages, config, self.fallback_timeout)
+
+    async def _tier(self, endpoints: list, messages, config, timeout: float):
+        attempted = []
+        try:
+            return await asyncio.wait_for(self._hedged(endpoints, messages, config, attempted), timeout)
+        except asyncio.TimeoutError:
+            for endpoint in set(attempted):
+                endpoint.failed(timeout)
+            raise
+
+    async def _hedged(self, endpoints: list, messages, config, attempted: list):
+        first = endpoints[0]
+        second = endpoints[1] if len(endpoints) > 1 else first
+        # Only the first request streams tokens to callbacks; a duplicate would
+        # interleave its tokens with the first one's
+        quiet = {**(config or {}), "callbacks": []}
+        tasks = {asyncio.create_task(self._attempt(first, messages, config)): first}
+        attempted.append(first)
+        hedge = None
+        error = None
+        try:
+            while True:
+                pending = [t for t in tasks if not t.done()]
+                wait = first.hedge_delay() if hedge is None and self.hedge else None
+                done, _ = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                            metrics.inc("gaia_llm_hedge_wins_total")
+                        return task.result()
+                    error = task.exception()
+
+                if hedge is None and (not done or error is not None):
+                    # Slow past the hedge delay, or failed fast: send the duplicate now
+                    if not done:
+                        self.hedges += 1
+                        metrics.inc("gaia_llm_hedges_total")
+                    hedge = asyncio.create_task(self._attempt(second, messages, quiet))
+                    tasks[hedge] = second
+                    attempted.append(second)
+                elif all(t.done() for t in tasks):
+                    raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _attempt(self, endpoint: Endpoint, messages, config):
+        start = time.perf_counter()
+        try:
+            response = await endpoint.model.ainvoke(messages, config)
+        except asyncio.CancelledError:
+            endpoint.abandoned(time.perf_counter() - start)
+            raise
+        except Exception:
+            endpoint.failed(time.perf_counter() - start)
+            raise
+        endpoint.succeeded(time.perf_counter() - start)
+        return response
+
+    def stats(self) -> dict:
+        return {
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "endpoints": {e.name: e.ewma for e in self.endpoints},
+        }
+
+
+def _endpoint_name(base_url: str, default: str) -> str:
+    if not base_url:
+        return default
+    return urlparse(base_url).netloc or base_url
+
+
+def build(**model_kwargs) -> LLMRouter:
+    """Router over the endpoints configured in the environment"""
+    from langchain_openai import ChatOpenAI
+
+    options = {"temperature": 0, "max_retries": 0, **model_kwargs}
+    endpoints = [
+        Endpoint(_endpoint_name(url, "openai"),
+                 ChatOpenAI(model=LLM_MODEL, base_url=url, request_timeout=LLM_TIMEOUT, **options))
+        for url in LLM_ENDPOINTS or [None]
+    ]
+    if LLM_FALLBACK_MODEL:
+        fallback = ChatOpenAI(
+            model=LLM_FALLBACK_MODEL,
+            base_url=LLM_FALLBACK_BASE_URL,
+            request_timeout=LLM_FALLBACK_TIMEOUT,
+            **({"api_key": LLM_FALLBACK_API_KEY} if LLM_FALLBACK_API_KEY else {}),
+            **options
+        )
+        endpoints.append(Endpoint(f"fallback:{LLM_FALLBACK_MODEL}", fallback, tier=1))
+    return LLMRouter(endpoints)
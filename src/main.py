@@ -1,57 +1,393 @@
 import os
 from telegram import Update
+from telegram.error import BadRequest
 from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters, ContextTypes
 from dotenv import load_dotenv
-from agent import agent, SystemMessage, HumanMessage
-from tools.calendar import set_telegram_callback
+from agent import build_agent, fast_path, is_trivial, run_guard, warm_up, llm_stats, HumanMessage, AIMessage
+from langchain_core.messages import RemoveMessage
+from tools import http_client
+import memory
+from outbox import Outbox, GLOBAL_RATE
+from dispatcher import ChatDispatcher, Debouncer
+import asyncio
+import llm_cache
+import metrics
+import workers
+from collections import deque
+import sys
 import traceback
+import time
 
 load_dotenv()
 BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
+# Point at a local stand-in (see fake_telegram.py) instead of api.telegram.org
+TELEGRAM_API_BASE_URL = os.environ.get("TELEGRAM_API_BASE_URL")
+
+# Update delivery: "polling" (default) or "webhook". In webhook mode Telegram
+# POSTs updates to WEBHOOK_URL, which may be a load balancer in front of
+# several bot workers listening on WEBHOOK_LISTEN:WEBHOOK_PORT
+BOT_MODE = os.environ.get("BOT_MODE", "polling").lower()
+WEBHOOK_LISTEN = os.environ.get("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "telegram")
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL")
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET")
+WEBHOOK_MAX_CONNECTIONS = int(os.environ.get("WEBHOOK_MAX_CONNECTIONS", "40"))
 
 # Global app instance
 app = None
+# Memory-backed graph, compiled by open_resources(); run it with `await agent.ainvoke(...)`
+agent = None
+outbox = None
+dispatcher = None
+debouncer = None
+# Messages from one chat arriving within this many seconds are answered together
+# (a lone message the fast path can answer is not held back)
+DEBOUNCE_SECONDS = float(os.environ.get("DEBOUNCE_SECONDS", "0.4"))
+BUSY_MESSAGE = "⏳ I'm handling a lot of requests right now, please try again in a moment."
 last_chat_id = None
-log_messages = []
+# Only the newest entries are kept (and the last 20 shown by /status)
+LOG_BUFFER_SIZE = int(os.environ.get("LOG_BUFFER_SIZE", "200"))
+log_messages = deque(maxlen=LOG_BUFFER_SIZE)
+metrics_server = None
+# "i/N" when running as one of N worker processes (see workers.py)
+worker = None
+
+# Streaming replies: a placeholder message is edited as tokens arrive, at
+# most once per STREAM_EDIT_INTERVAL seconds to stay under Telegram limits
+STREAM_REPLIES = os.environ.get("STREAM_REPLIES", "1").lower() in ("1", "true", "yes")
+STREAM_EDIT_INTERVAL = float(os.environ.get("STREAM_EDIT_INTERVAL", "1.0"))
+TELEGRAM_MAX_LENGTH = 4096
+TOOL_PROGRESS = {
+    "wikipedia": "🔎 Searching Wikipedia…",
+    "web_search": "🌐 Searching the web…",
+    "calculate": "🧮 Calculating…",
+    "add_note": "📝 Saving note…",
+    "get_notes": "📒 Reading notes…",
+    "search_notes": "📒 Searching notes…",
+    "set_reminder": "⏰ Setting reminder…",
+    "set_recurring_reminder": "🔔 Setting reminder…",
+}
+
+
+async def telegram_callback(chat_id, msg: str):
+    # Reminders due together for one chat are merged into one message
+    if outbox:
+        await outbox.send(chat_id, msg, merge=True)
+
+
+async def reply(update: Update, text: str):
+    """Reply to `update` through the rate-limited outbox"""
+    return await outbox.submit(update.message.chat_id, lambda: update.message.reply_text(text))
 
 
-async def telegram_callback(msg: str):
-    if last_chat_id and app:
-        await app.bot.send_message(last_chat_id, msg)
+async def stream_reply(update: Update, messages: list, config: dict) -> str:
+    """Run the graph and stream its answer into a progressively edited message"""
+    chat_id = update.message.chat_id
+    placeholder = await reply(update, "…")
+    try:
+        return await _stream_into(placeholder, update, messages, config)
+    except asyncio.CancelledError:
+        # Superseded by a newer message: remove the partial answer
+        await outbox.submit(chat_id, placeholder.delete)
+        raise
+
+
+async def _stream_into(placeholder, update: Update, messages: list, config: dict) -> str:
+    chat_id = update.message.chat_id
+    shown = "…"
+    text = ""
+    progress = ""
+    answer = ""
+    last_edit = 0.0
+
+    async def edit(content: str):
+        nonlocal shown, last_edit
+        content = content[:TELEGRAM_MAX_LENGTH]
+        if not content.strip() or content == shown:
+            return
+        try:
+            await outbox.submit(chat_id, lambda: placeholder.edit_text(content))
+            shown = content
+            last_edit = time.monotonic()
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                raise
+
+    async for mode, data in agent.astream({"messages": messages}, config, stream_mode=["messages", "updates"]):
+        if mode == "messages":
+            chunk, metadata = data
+            if metadata.get("langgraph_node") == "agent" and isinstance(chunk.content, str):
+                text += chunk.content
+        else:
+            step = (data or {}).get("agent") or {}
+            for message in step.get("messages", []):
+                if getattr(message, "tool_calls", None):
+                    # Text streamed before a tool call is not the final answer
+                    text = ""
+                    progress = "\n".join(TOOL_PROGRESS.get(tc["name"], f"⚙️ Running {tc['name']}…")
+                                         for tc in message.tool_calls)
+                else:
+                    answer = message.content
+
+        if time.monotonic() - last_edit >= STREAM_EDIT_INTERVAL:
+            await edit(text or progress)
+
+    answer = answer or text
+    guard = run_guard.get()
+    if guard is not None:
+        guard["committed"] = True
+    await edit(answer)
+    # Telegram caps messages at 4096 characters; send any overflow separately
+    for i in range(TELEGRAM_MAX_LENGTH, len(answer), TELEGRAM_MAX_LENGTH):
+        await reply(update, answer[i:i + TELEGRAM_MAX_LENGTH])
+    return answer
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     global last_chat_id
     last_chat_id = update.message.chat_id
     log_messages.append(f"Start command from chat_id {last_chat_id}")
-    await update.message.reply_text("Gaia Assistant is running!")
+    await reply(update, "Gaia Assistant is running!")
 
 
 async def handle(update: Update, context: ContextTypes.DEFAULT_TYPE):
     global last_chat_id
-    last_chat_id = update.message.chat_id
-    user_msg = update.message.text
-    log_messages.append(f"Received message from {last_chat_id}: {user_msg}")
+    chat_id = last_chat_id = update.message.chat_id
+    log_messages.append(f"Received message from {chat_id}: {update.message.text}")
+    if DEBOUNCE_SECONDS > 0:
+        debouncer.add(chat_id, update.message.text, update, immediate=is_trivial(update.message.text))
+    else:
+        await dispatch(chat_id, [update.message.text], update, {"started": True, "committed": False})
+
+
+async def dispatch(chat_id, texts: list, update: Update, run_state: dict):
+    # Chats run concurrently, each chat's messages in order, under a global cap
+    if not await dispatcher.submit(chat_id, lambda: process(update, "\n".join(texts), run_state)):
+        log_messages.append(f"Rejected message from {chat_id}: dispatcher full")
+        await reply(update, BUSY_MESSAGE)
+
+
+async def process(update: Update, user_msg: str, run_state: dict):
+    """
+    Answer one (possibly merged) user message with the fast path or the
+    agent graph. Until run_state is committed the run may be cancelled by
+    a newer fragment; its messages are then rolled back from memory.
+    """
+    chat_id = update.message.chat_id
+    config = memory.thread_config(chat_id)
+    known_ids = None
     try:
-        messages = [
-            SystemMessage(content="You are a helpful assistant. Use the available tools."),
-            HumanMessage(content=user_msg)
-        ]
-        result = agent.invoke({"messages": messages})
-        reply = result["messages"][-1].content
-        log_messages.append(f"Reply sent: {reply}")
-        await update.message.reply_text(reply)
+        answer = fast_path(user_msg, config)
+        if answer is not None:
+            run_state["committed"] = True
+            # Keep the exchange in the chat's history even though the graph was skipped
+            await agent.aupdate_state(
+                config,
+                {"messages": [HumanMessage(content=user_msg), AIMessage(content=answer)]},
+                as_node="agent"
+            )
+            await reply(update, answer)
+        else:
+            state = await agent.aget_state(config)
+            history = state.values.get("messages", [])
+            known_ids = {m.id for m in history}
+            # Old turns are summarized by the graph's compact node, not dropped
+            messages = [HumanMessage(content=user_msg)]
+            run_guard.set(run_state)
+            if STREAM_REPLIES:
+                answer = await stream_reply(update, messages, config)
+            else:
+                result = await agent.ainvoke({"messages": messages}, config)
+                answer = result["messages"][-1].content
+                run_state["committed"] = True
+                await reply(update, answer)
+        await memory.after_run(chat_id)
+        log_messages.append(f"Reply sent: {answer}")
+    except asyncio.CancelledError:
+        if known_ids is not None and not run_state["committed"]:
+            await _rollback(config, known_ids)
+        raise
     except Exception as e:
         tb = traceback.format_exc()
         log_messages.append(f"Error processing message:\n{tb}")
-        await update.message.reply_text(f"An error occurred:\n{str(e)}")
+        await reply(update, f"An error occurred:\n{str(e)}")
+
+
+async def _rollback(config: dict, known_ids: set):
+    """Drop the messages a superseded run added to the chat's history"""
+    state = await agent.aget_state(config)
+    added = [m for m in state.values.get("messages", []) if m.id not in known_ids]
+    if added:
+        await agent.aupdate_state(config, {"messages": [RemoveMessage(id=m.id) for m in added]}, as_node="agent")
 
 
 async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.message.chat_id
     log_messages.append(f"Status requested by {chat_id}")
-    recent_logs = "\n".join(log_messages[-20:])
-    await update.message.reply_text(f"Bot Status:\nLast chat_id: {last_chat_id}\nRecent logs:\n{recent_logs}")
+    recent_logs = "\n".join(list(log_messages)[-20:])
+    cache = llm_cache.stats()
+    cache_line = (
+        f"LLM cache: {cache['hit_rate']:.0%} hit rate ({cache['hits']} hits, {cache['misses']} misses)"
+        if cache["enabled"] else "LLM cache: disabled"
+    )
+    runs = dispatcher.stats()
+    runs_line = f"Agent runs: {runs['running']} running, {runs['waiting']} waiting, {runs['rejected']} rejected"
+    worker_line = f"Worker: {worker}\n" if worker else ""
+    await reply(
+        update,
+        f"Bot Status:\n{worker_line}Last chat_id: {last_chat_id}\n{cache_line}\n{runs_line}\n"
+        f"{_latency_report()}\nRecent logs:\n{recent_logs}"
+    )
+
+
+def _latency_report() -> str:
+    """p50/p95/p99 per graph node, tool and LLM call, plus token totals"""
+    lines = ["Latency (p50 / p95 / p99, calls):"]
+    for name in ("gaia_node_seconds", "gaia_tool_seconds", "gaia_llm_seconds"):
+        for labels, (p50, p95, p99, count) in metrics.percentiles(name).items():
+            label = dict(labels).get("node") or dict(labels).get("tool") or "llm"
+            lines.append(f"  {label}: {p50:.2f}s / {p95:.2f}s / {p99:.2f}s ({count})")
+    if len(lines) == 1:
+        lines.append("  no runs yet")
+    prompt = metrics.counter("gaia_llm_tokens_total", kind="prompt")
+    completion = metrics.counter("gaia_llm_tokens_total", kind="completion")
+    lines.append(f"LLM tokens: {prompt:.0f} prompt, {completion:.0f} completion")
+    llm = llm_stats()
+    if llm:
+        endpoints = ", ".join(f"{name} {ewma:.2f}s" if ewma is not None else f"{name} -"
+                              for name, ewma in llm["endpoints"].items())
+        lines.append(f"LLM endpoints (EWMA): {endpoints}; {llm['hedges']} hedged "
+                     f"({llm['hedge_wins']} won by the hedge), {llm['failovers']} failovers")
+    return "\n".join(lines)
+
+
+def _register_gauges():
+    metrics.describe("gaia_node_seconds", "Graph node latency")
+    metrics.describe("gaia_tool_seconds", "Tool call latency")
+    metrics.describe("gaia_llm_seconds", "LLM request latency (cache misses only)")
+    metrics.describe("gaia_llm_tokens_total", "LLM tokens by kind")
+    metrics.describe("gaia_tool_calls_total", "Tool calls by outcome")
+    metrics.describe("gaia_tool_output_tokens_total", "Tokens of over-budget tool outputs before and after trimming")
+    metrics.describe("gaia_llm_endpoint_seconds", "LLM latency per endpoint (successful requests)")
+    metrics.describe("gaia_llm_hedges_total", "Duplicate LLM requests sent after the hedge delay")
+    metrics.describe("gaia_llm_hedge_wins_total", "Hedged duplicates that answered first")
+    metrics.describe("gaia_llm_failovers_total", "LLM calls that failed over to the fallback model")
+    metrics.gauge(
+        "gaia_llm_endpoint_ewma_seconds",
+        lambda: {name: ewma for name, ewma in llm_stats().get("endpoints", {}).items() if ewma is not None},
+        "Latency EWMA used to route LLM requests", label="endpoint"
+    )
+    metrics.gauge("gaia_outbox_queued", outbox.depth, "Outbound Telegram operations waiting")
+    metrics.gauge("gaia_agent_runs", lambda: {k: v for k, v in dispatcher.stats().items() if k != "rejected"},
+                  "Agent runs by state", label="state")
+    metrics.gauge("gaia_agent_runs_rejected", lambda: dispatcher.stats()["rejected"], "Runs rejected when full")
+    metrics.gauge("gaia_debouncer_events", debouncer.stats, "Coalesced and superseded fragments", label="event")
+    metrics.gauge("gaia_cache_hit_rate", _cache_hit_rates, "Cache hit rate", label="cache")
+
+
+def _cache_hit_rates() -> dict:
+    rates = {"llm": llm_cache.stats()["hit_rate"]}
+    # Tool caches exist once the registry has loaded their module
+    wikipedia = sys.modules.get("tools.wikipedia")
+    if wikipedia:
+        rates["wikipedia"] = wikipedia.cache.stats()["hit_rate"]
+    websearch = sys.modules.get("tools.websearch")
+    if websearch:
+        rates["web_search"] = websearch.cache_stats()["hit_rate"]
+    return rates
+
+
+async def post_init(application):
+    """Open shared resources once the application is initialized"""
+    await open_resources(application.bot)
+
+
+async def post_shutdown(application):
+    """Release shared resources when the application stops"""
+    await close_resources()
+
+
+async def open_resources(bot, metrics_port: int = metrics.METRICS_PORT, owns=None, worker_name: str = None,
+                         global_rate: float = GLOBAL_RATE):
+    """
+    Open everything the handlers need. A worker process passes `owns`, a
+    predicate on chat_id, so it only schedules its own chats' reminders,
+    and its share of the global send rate.
+    """
+    global agent, worker
+    global outbox, dispatcher, debouncer, metrics_server
+    # Deferred until here so that importing this module stays cheap
+    from tools.calendar import start_reminders
+    worker = worker_name
+    http_client.start()
+    outbox = Outbox(bot, global_rate=global_rate)
+    dispatcher = ChatDispatcher()
+    debouncer = Debouncer(DEBOUNCE_SECONDS, dispatch)
+    # Reminder timers live on this loop; stored reminders are reloaded
+    start_reminders(telegram_callback, owns)
+    # Per-chat conversation memory
+    agent = build_agent(await memory.open_checkpointer())
+    # Create the LLM client and load the tools before the first message
+    await asyncio.to_thread(warm_up)
+    # Prometheus scrape endpoint, off unless METRICS_PORT is set
+    _register_gauges()
+    metrics_server = await metrics.serve(metrics_port)
+
+
+async def close_resources(drain: float = 0):
+    """Release what open_resources() opened, first letting running batches finish for up to `drain` seconds"""
+    from tools.calendar import stop_reminders
+    if metrics_server:
+        metrics_server.close()
+    if drain:
+        await debouncer.drain(drain)
+    await debouncer.close()
+    stop_reminders()
+    await outbox.close()
+    await http_client.aclose()
+    await memory.close()
+
+
+def run_webhook(application):
+    """Serve updates from Telegram's webhook instead of long polling"""
+    if not WEBHOOK_URL:
+        raise RuntimeError("WEBHOOK_URL not set in environment")
+    if not WEBHOOK_SECRET:
+        raise RuntimeError("WEBHOOK_SECRET not set in environment")
+
+    print(f"Bot is listening for webhook updates on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}...")
+    # Requests without the matching X-Telegram-Bot-Api-Secret-Token header are rejected
+    application.run_webhook(
+        listen=WEBHOOK_LISTEN,
+        port=WEBHOOK_PORT,
+        url_path=WEBHOOK_PATH,
+        webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+    )
+
+
+def build_application(on_init=None, on_shutdown=None):
+    builder = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        # Ordering and limits are enforced by the ChatDispatcher
+        .concurrent_updates(True)
+    )
+    if on_init:
+        builder = builder.post_init(on_init)
+    if on_shutdown:
+        builder = builder.post_shutdown(on_shutdown)
+    if TELEGRAM_API_BASE_URL:
+        builder = builder.base_url(TELEGRAM_API_BASE_URL)
+    return builder.build()
+
+
+def add_handlers(application):
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle))
+    application.add_handler(CommandHandler("status", status))
 
 
 def main():
@@ -63,16 +399,20 @@ def main():
         print("Starting Telegram bot...")
         print(f"Bot token loaded: {BOT_TOKEN[:10]}...")
 
-        app = ApplicationBuilder().token(BOT_TOKEN).build()
-
-        app.add_handler(CommandHandler("start", start))
-        app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle))
-        app.add_handler(CommandHandler("status", status))
-
-        set_telegram_callback(telegram_callback)
+        if workers.WORKERS > 0:
+            # Thin receiver; the agent runs in the worker processes
+            print(f"Sharding chats across {workers.WORKERS} worker processes...")
+            app = build_application(workers.receiver_post_init, workers.receiver_post_shutdown)
+            app.add_handler(MessageHandler(filters.TEXT, workers.forward))
+        else:
+            app = build_application(post_init, post_shutdown)
+            add_handlers(app)
 
-        print("Bot is now polling for messages...")
-        app.run_polling()
+        if BOT_MODE == "webhook":
+            run_webhook(app)
+        else:
+            print("Bot is now polling for messages...")
+            app.run_polling()
 
     except Exception as e:
         print(f"FATAL ERROR: {e}")
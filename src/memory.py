@@ -0,0 +1,117 @@
+"""
+Per-chat conversation memory.
+
+Each Telegram chat is a LangGraph thread whose state lives in a local
+SQLite checkpointer (WAL mode, indexed by thread_id). Storage stays
+bounded by three retention rules:
+
+- past MEMORY_MAX_MESSAGES messages, a chat's older turns are folded into
+  its running summary (see compaction.py),
+- only the newest MEMORY_CHECKPOINTS_PER_CHAT checkpoints are kept per chat,
+- chats idle for longer than MEMORY_IDLE_DAYS are evicted entirely, at
+  startup and then at most every MEMORY_EVICT_INTERVAL seconds after a run.
+"""
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+MEMORY_DB_PATH = os.environ.get("MEMORY_DB_PATH", "memory.sqlite")
+MAX_STORED_MESSAGES = int(os.environ.get("MEMORY_MAX_MESSAGES", "60"))
+CHECKPOINTS_PER_CHAT = int(os.environ.get("MEMORY_CHECKPOINTS_PER_CHAT", "3"))
+IDLE_DAYS = float(os.environ.get("MEMORY_IDLE_DAYS", "30"))
+EVICT_INTERVAL = float(os.environ.get("MEMORY_EVICT_INTERVAL", "3600"))
+
+_conn = None
+checkpointer = None
+_last_eviction = 0.0
+
+
+async def open_checkpointer(path: str = MEMORY_DB_PATH):
+    """Open the SQLite store and return a checkpointer for the graph"""
+    global _conn, checkpointer
+    # Imported here so that importing this module stays cheap
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    # Worker processes share the file; wait for each other's write locks
+    _conn = await aiosqlite.connect(path, timeout=10)
+    await _conn.execute("PRAGMA journal_mode=WAL")
+    await _conn.execute("PRAGMA synchronous=NORMAL")
+    checkpointer = AsyncSqliteSaver(_conn)
+    await checkpointer.setup()
+
+    # Last activity per chat, for idle eviction
+    await _conn.execute(
+        "CREATE TABLE IF NOT EXISTS chat_activity (thread_id TEXT PRIMARY KEY, last_seen REAL NOT NULL)"
+    )
+    await _conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_activity_last_seen ON chat_activity (last_seen)")
+    await _conn.commit()
+
+    evicted = await evict_idle()
+    logger.info(f"Conversation memory opened at {path} (evicted {evicted} idle chats)")
+    return checkpointer
+
+
+async def close():
+    global _conn, checkpointer
+    if _conn is not None:
+        await _conn.close()
+    _conn = None
+    checkpointer = None
+
+
+def thread_config(chat_id) -> dict:
+    """Graph config that selects the thread of one chat"""
+    return {"configurable": {"thread_id": str(chat_id)}}
+
+
+async def after_run(chat_id):
+    """
+    Record activity for a chat and drop its superseded checkpoints; evict
+    idle chats if the last eviction is more than EVICT_INTERVAL old
+    """
+    if _conn is None:
+        return
+    thread_id = str(chat_id)
+    await _conn.execute(
+        "INSERT OR REPLACE INTO chat_activity (thread_id, last_seen) VALUES (?, ?)",
+        (thread_id, time.time())
+    )
+    keep = (thread_id, thread_id, CHECKPOINTS_PER_CHAT)
+    await _conn.execute(
+        """DELETE FROM writes WHERE thread_id = ? AND checkpoint_id NOT IN (
+               SELECT checkpoint_id FROM checkpoints WHERE thread_id = ?
+               ORDER BY checkpoint_id DESC LIMIT ?)""",
+        keep
+    )
+    await _conn.execute(
+        """DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id NOT IN (
+               SELECT checkpoint_id FROM checkpoints WHERE thread_id = ?
+               ORDER BY checkpoint_id DESC LIMIT ?)""",
+        keep
+    )
+    await _conn.commit()
+
+    if time.monotonic() - _last_eviction >= EVICT_INTERVAL:
+        evicted = await evict_idle()
+        if evicted:
+            logger.info(f"Evicted {evicted} idle chats")
+
+
+async def evict_idle() -> int:
+    """Delete every chat that has been idle for longer than IDLE_DAYS"""
+    global _last_eviction
+    if _conn is None:
+        return 0
+    _last_eviction = time.monotonic()
+    cutoff = time.time() - IDLE_DAYS * 86400
+    async with _conn.execute("SELECT thread_id FROM chat_activity WHERE last_seen < ?", (cutoff,)) as cursor:
+        idle = [row[0] for row in await cursor.fetchall()]
+    for thread_id in idle:
+        await _conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+        await _conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+        await _conn.execute("DELETE FROM chat_activity WHERE thread_id = ?", (thread_id,))
+    await _conn.commit()
+    return len(idle)
@@ -0,0 +1,191 @@
+"""
+In-process instrumentation: latency histograms, counters and gauges.
+
+Histograms keep cumulative buckets (for the Prometheus endpoint) plus a
+bounded window of recent samples (for p50/p95/p99 in /status), so memory
+stays constant however long the bot runs.
+"""
+import os
+import time
+import asyncio
+import bisect
+import logging
+import functools
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SAMPLE_WINDOW = 1024
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS, window: int = SAMPLE_WINDOW):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+    def percentile(self, q: float) -> float:
+        """q-th percentile (0-100) of the recent samples"""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+# (name, sorted label items) -> Histogram / float
+_histograms = {}
+_counters = {}
+# name -> callable returning a number or {label value: number}
+_gauges = {}
+_help = {}
+
+
+def _key(name: str, labels: dict):
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(name: str, value: float, **labels):
+    key = _key(name, labels)
+    histogram = _histograms.get(key)
+    if histogram is None:
+        histogram = _histograms[key] = Histogram()
+    histogram.observe(value)
+
+
+def inc(name: str, amount: float = 1, **labels):
+    key = _key(name, labels)
+    _counters[key] = _counters.get(key, 0) + amount
+
+
+def gauge(name: str, fn, help: str = None, label: str = None):
+    """Register a gauge read at scrape time; fn may return {label value: number}"""
+    _gauges[name] = (fn, label)
+    if help:
+        _help[name] = help
+
+
+def describe(name: str, help: str):
+    _help[name] = help
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Observe the duration of the block in histogram `name`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def timed(name: str, **labels):
+    """Decorator form of `timer` for async functions"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with timer(name, **labels):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def percentiles(name: str) -> dict:
+    """{labels: (p50, p95, p99, count)} for every series of histogram `name`"""
+    return {
+        labels: (h.percentile(50), h.percentile(95), h.percentile(99), h.count)
+        for (hist_name, labels), h in sorted(_histograms.items())
+        if hist_name == name
+    }
+
+
+def counter(name: str, **labels) -> float:
+    return _counters.get(_key(name, labels), 0)
+
+
+def _fmt_labels(labels, extra: dict = None) -> str:
+    items = list(labels) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    seen = set()
+
+    def header(name, kind):
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), h in sorted(_histograms.items()):
+        header(name, "histogram")
+        cumulative = 0
+        for bound, count in zip(list(h.buckets) + ["+Inf"], h.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_fmt_labels(labels, {'le': bound})} {cumulative}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {h.sum}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {h.count}")
+
+    for (name, labels), value in sorted(_counters.items()):
+        header(name, "counter")
+        lines.append(f"{name}{_fmt_labels(labels)} {value}")
+
+    for name, (fn, label) in sorted(_gauges.items()):
+        try:
+            value = fn()
+        except Exception as e:
+            logger.error(f"Gauge {name} failed: {e}")
+            continue
+        header(name, "gauge")
+        if isinstance(value, dict):
+            for label_value, v in sorted(value.items()):
+                lines.append(f"{name}{_fmt_labels((), {label or 'name': label_value})} {v}")
+        else:
+            lines.append(f"{name} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+async def _handle_scrape(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        path = request.split()[1] if len(request.split()) > 1 else b"/"
+        if path.split(b"?")[0] == b"/metrics":
+            status, body = "200 OK", render().encode()
+        else:
+            status, body = "404 Not Found", b"not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve(port: int = METRICS_PORT, host: str = METRICS_HOST):
+    """Serve GET /metrics on the running loop; returns the server (None if port is 0)"""
+    if not port:
+        return None
+    server = await asyncio.start_server(_handle_scrape, host, port)
+    logger.info(f"Metrics endpoint on http://{host}:{port}/metrics")
+    return server
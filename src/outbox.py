@@ -0,0 +1,185 @@
+"""
+Rate-limited outbound queue for everything the bot sends to Telegram.
+
+Every send or edit passes a global and a per-chat token bucket, so bursts
+(e.g. many "daily at 9am" reminders firing together) stay under
+Telegram's flood limits. RetryAfter pauses the whole queue for the
+requested time and the operation is retried. Reminders for one chat that
+come due within MERGE_WINDOW seconds are sent as a single message.
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import timedelta
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows about 30 messages/s overall and 1 message/s per chat
+GLOBAL_RATE = float(os.environ.get("OUTBOX_GLOBAL_RATE", "25"))
+CHAT_RATE = float(os.environ.get("OUTBOX_CHAT_RATE", "1"))
+CHAT_BURST = int(os.environ.get("OUTBOX_CHAT_BURST", "3"))
+MERGE_WINDOW = float(os.environ.get("OUTBOX_MERGE_WINDOW", "2"))
+MAX_RETRIES = 3
+MAX_IDLE_BUCKETS = 1024
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+@dataclass
+class _Item:
+    future: asyncio.Future
+    op: object = None          # zero-arg coroutine function, for plain operations
+    text: str = None           # message text, for mergeable sends
+    ready_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def mergeable(self) -> bool:
+        return self.op is None
+
+
+class Outbox:
+    """Per-chat FIFO queues drained under global and per-chat rate limits"""
+
+    def __init__(self, bot, global_rate: float = GLOBAL_RATE, chat_rate: float = CHAT_RATE,
+                 chat_burst: int = CHAT_BURST, merge_window: float = MERGE_WINDOW):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.merge_window = merge_window
+        self.sent = 0
+        self.merged = 0
+        self.retries = 0
+        self._global = TokenBucket(global_rate, global_rate)
+        self._buckets = {}
+        self._queues = {}
+        self._workers = {}
+        self._paused_until = 0.0
+
+    def depth(self) -> int:
+        """Operations waiting to be sent"""
+        return sum(len(q) for q in self._queues.values())
+
+    async def submit(self, chat_id, op):
+        """Run `op()` (a coroutine function, e.g. a reply) under the rate limits"""
+        return await self._enqueue(chat_id, _Item(future=asyncio.get_running_loop().create_future(), op=op))
+
+    async def send(self, chat_id, text: str, merge: bool = False):
+        """
+        Send `text` to `chat_id`. With merge=True the message waits up to
+        merge_window seconds so it can be combined with other mergeable
+        messages for the same chat.
+        """
+        if not merge:
+            return await self.submit(chat_id, lambda: self.bot.send_message(chat_id, text))
+        item = _Item(
+            future=asyncio.get_running_loop().create_future(),
+            text=text,
+            ready_at=time.monotonic() + self.merge_window
+        )
+        return await self._enqueue(chat_id, item)
+
+    async def close(self):
+        for task in list(self._workers.values()):
+            task.cancel()
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
+
+    async def _enqueue(self, chat_id, item: _Item):
+        self._queues.setdefault(chat_id, deque()).append(item)
+        if chat_id not in self._workers:
+            self._workers[chat_id] = asyncio.create_task(self._drain(chat_id))
+        return await item.future
+
+    async def _drain(self, chat_id):
+        queue = self._queues[chat_id]
+        bucket = self._buckets.get(chat_id) or TokenBucket(self.chat_rate, self.chat_burst)
+        self._buckets[chat_id] = bucket
+        try:
+            while queue:
+                if queue[0].mergeable:
+                    delay = queue[0].ready_at - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    batch = []
+                    while queue and queue[0].mergeable:
+                        batch.append(queue.popleft())
+                    text = "\n".join(item.text for item in batch)
+                    self.merged += len(batch) - 1
+
+                    def op(text=text):
+                        return self.bot.send_message(chat_id, text)
+                else:
+                    batch = [queue.popleft()]
+                    op = batch[0].op
+
+                try:
+                    result = await self._execute(bucket, op)
+                except Exception as e:
+                    for item in batch:
+                        if not item.future.done():
+                            item.future.set_exception(e)
+                else:
+                    for item in batch:
+                        if not item.future.done():
+                            item.future.set_result(result)
+        finally:
+            del self._workers[chat_id]
+            if not queue:
+                del self._queues[chat_id]
+            if len(self._buckets) > MAX_IDLE_BUCKETS:
+                # Idle chats whose bucket has refilled need no state
+                self._buckets = {
+                    c: b for c, b in self._buckets.items() if c in self._workers or not b.full()
+                }
+
+    async def _execute(self, bucket: TokenBucket, op):
+        for attempt in range(MAX_RETRIES + 1):
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            await bucket.acquire()
+            await self._global.acquire()
+            try:
+                result = await op()
+                self.sent += 1
+                return result
+            except RetryAfter as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                delay = e.retry_after
+                if isinstance(delay, timedelta):
+                    delay = delay.total_seconds()
+                self.retries += 1
+                logger.warning(f"Telegram flood limit, pausing sends for {delay}s")
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    def stats(self) -> dict:
+        return {"queued": self.depth(), "sent": self.sent, "merged": self.merged, "retries": self.retries}
@@ -0,0 +1,135 @@
+"""
+Relevance-based budgeting of tool output.
+
+Long tool results (Wikipedia intros, note listings, search abstracts) are
+cut down to a per-tool token budget before they reach the LLM. The output
+is split into segments (lines for listings, sentences for prose). Segments
+are ranked against the user's question and the tool arguments with BM25,
+and the best ones are kept in their original order. Outputs within budget,
+and pinned tools whose output is short and exact (calculate, reminders),
+pass through untouched.
+"""
+import os
+import re
+import math
+from collections import Counter
+
+import compaction
+import metrics
+
+# Token budget per tool; tools not listed get DEFAULT_TOOL_BUDGET
+TOOL_BUDGETS = {
+    "wikipedia": int(os.environ.get("WIKIPEDIA_TOKEN_BUDGET", "250")),
+    "web_search": int(os.environ.get("WEB_SEARCH_TOKEN_BUDGET", "200")),
+    "get_notes": int(os.environ.get("NOTES_TOKEN_BUDGET", "300")),
+    "search_notes": int(os.environ.get("NOTES_TOKEN_BUDGET", "300")),
+}
+DEFAULT_TOOL_BUDGET = int(os.environ.get("TOOL_TOKEN_BUDGET", "400"))
+PINNED_TOOLS = {
+    "calculate", "get_current_time", "add_note",
+    "set_reminder", "set_recurring_reminder", "list_reminders", "cancel_reminder",
+}
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# The first segment (a definition, a listing header) gets a small head start
+LEAD_BONUS = 0.5
+
+WORD_RE = re.compile(r"\w+")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its me my of on or "
+    "that the this to was were what when where which who why will with you your".split()
+)
+
+
+def _terms(text: str) -> list:
+    return [w for w in WORD_RE.findall(text.lower()) if w not in STOPWORDS]
+
+
+def segment(text: str) -> list:
+    """Lines for multi-line output (listings), sentences otherwise"""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) > 1:
+        return lines
+    return [s for s in SENTENCE_RE.split(text.strip()) if s]
+
+
+def bm25_scores(query: str, segments: list) -> list:
+    """Okapi BM25 score of each segment for `query`, with the segments as the corpus"""
+    docs = [Counter(_terms(s)) for s in segments]
+    lengths = [sum(d.values()) for d in docs]
+    avg_length = (sum(lengths) / len(docs)) or 1.0
+    query_terms = set(_terms(query))
+    df = {t: sum(1 for d in docs if t in d) for t in query_terms}
+    n = len(docs)
+
+    scores = []
+    for doc, length in zip(docs, lengths):
+        score = 0.0
+        for term in query_terms:
+            tf = doc.get(term, 0)
+            if tf:
+                idf = math.log((n - df[term] + 0.5) / (df[term] + 0.5) + 1)
+                score += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / avg_length))
+        scores.append(score)
+    return scores
+
+
+def select(text: str, query: str, budget: int) -> str:
+    """Keep the segments of `text` most relevant to `query` that fit `budget` tokens"""
+    segments = segment(text)
+    if len(segments) < 2:
+        return text
+    multiline = "\n" in text.strip()
+    # Listing headers ("Notes 1-20 of 57:") are always kept
+    headers = {i for i, s in enumerate(segments) if multiline and s.rstrip().endswith(":")}
+
+    scores = bm25_scores(query, segments)
+    matched = any(score > 0 for score in scores)
+    scores[0] += LEAD_BONUS
+    ranked = sorted((i for i in range(len(segments)) if i not in headers), key=lambda i: -scores[i])
+    if matched:
+        # Only segments sharing terms with the query (and the lead) are worth their tokens;
+        # with no overlap at all (or only a header matching) this degrades to
+        # keeping the opening segments
+        ranked = [i for i in ranked if scores[i] > 0] or ranked
+
+    kept = set(headers)
+    used = sum(compaction.count_text(segments[i]) for i in headers)
+    for i in ranked:
+        cost = compaction.count_text(segments[i])
+        if used + cost <= budget:
+            kept.add(i)
+            used += cost
+    if not kept - headers:
+        # Not even one segment fits: cut the best one down to the budget
+        best = ranked[0] if ranked else 0
+        return segments[best][:budget * 4].rstrip() + "…"
+
+    omitted = len(segments) - len(kept)
+    if multiline:
+        body = "\n".join(segments[i] for i in sorted(kept))
+        return f"{body}\n[… {omitted} more not shown]" if omitted else body
+    parts = []
+    for i in sorted(kept):
+        if parts and i - 1 not in kept:
+            parts.append("…")
+        parts.append(segments[i])
+    return " ".join(parts)
+
+
+def apply(tool_name: str, content: str, query: str) -> str:
+    """Budget one tool result; pinned, error and within-budget outputs are returned as is"""
+    if tool_name in PINNED_TOOLS or content.startswith("Error"):
+        return content
+    budget = TOOL_BUDGETS.get(tool_name, DEFAULT_TOOL_BUDGET)
+    tokens = compaction.count_text(content)
+    if tokens <= budget:
+        return content
+
+    trimmed = select(content, query, budget)
+    metrics.inc("gaia_tool_output_tokens_total", tokens, tool=tool_name, stage="raw")
+    metrics.inc("gaia_tool_output_tokens_total", compaction.count_text(trimmed), tool=tool_name, stage="kept")
+    return trimmed
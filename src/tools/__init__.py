@@ -0,0 +1,42 @@
+"""
+Tool registry.
+
+Tool modules are imported the first time one of their tools is needed,
+so importing the agent does not pull in every tool's dependencies.
+"""
+import importlib
+import threading
+
+# Tool name -> module defining it (the tool object has the same name)
+REGISTRY = {
+    "calculate": "tools.calculate",
+    "wikipedia": "tools.wikipedia",
+    "add_note": "tools.notes",
+    "get_notes": "tools.notes",
+    "search_notes": "tools.notes",
+    "web_search": "tools.websearch",
+    "set_reminder": "tools.calendar",
+    "set_recurring_reminder": "tools.calendar",
+    "list_reminders": "tools.calendar",
+    "cancel_reminder": "tools.calendar",
+    "get_current_time": "tools.calendar",
+}
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def get_tool(name: str):
+    """The tool registered as `name`, importing its module on first use; None if unknown"""
+    tool = _loaded.get(name)
+    if tool is None and name in REGISTRY:
+        with _lock:
+            tool = _loaded.get(name)
+            if tool is None:
+                tool = _loaded[name] = getattr(importlib.import_module(REGISTRY[name]), name)
+    return tool
+
+
+def load_tools() -> list:
+    """All registered tools, in registry order"""
+    return [get_tool(name) for name in REGISTRY]
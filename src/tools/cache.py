@@ -0,0 +1,204 @@
+from collections import OrderedDict
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# How often the disk tier drops expired rows and trims itself to max_rows
+PURGE_INTERVAL = 600
+
+_MISSING = object()
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive cache key for free-text queries"""
+    return " ".join(query.lower().split())
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire after `ttl` seconds.
+
+    With `path` set, entries are also written to a SQLite file so they
+    survive restarts; memory misses fall through to that disk tier.
+    Values must be JSON-serializable when the disk tier is enabled. The
+    disk tier holds about `max_rows` entries (default 10 * maxsize):
+    expired rows are purged every PURGE_INTERVAL seconds, and the rows
+    expiring soonest are dropped beyond the cap. From async code use
+    aget()/aset(), which run the SQLite work in a thread.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600, path: str = None, name: str = "cache",
+                 max_rows: int = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self.max_rows = max_rows or maxsize * 10
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._last_purge = 0.0
+        self._writes = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache (expires)")
+            self._db.commit()
+            self.purge_expired()
+
+    def get(self, key, default=None):
+        value = self._get_memory(key)
+        if value is _MISSING and self._db is not None:
+            value = self._get_disk(key)
+        return self._count(value, default)
+
+    async def aget(self, key, default=None):
+        """get() for the event loop: memory hits answer inline, disk reads run in a thread"""
+        value = self._get_memory(key)
+        if value is _MISSING and self._db is not None:
+            value = await asyncio.to_thread(self._get_disk, key)
+        return self._count(value, default)
+
+    def set(self, key, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._store(key, value, time.monotonic() + ttl)
+        if self._db is not None:
+            self._set_disk(key, value, ttl)
+
+    async def aset(self, key, value, ttl: float = None):
+        """set() for the event loop: the disk write runs in a thread"""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._store(key, value, time.monotonic() + ttl)
+        if self._db is not None:
+            await asyncio.to_thread(self._set_disk, key, value, ttl)
+
+    def _count(self, value, default):
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def _get_memory(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires, value = entry
+            if expires > time.monotonic():
+                self._data.move_to_end(key)
+                return value
+            del self._data[key]
+            return _MISSING
+
+    def _get_disk(self, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            remaining = row[1] - time.time() if row else 0
+            if remaining <= 0:
+                return _MISSING
+            value = json.loads(row[0])
+            # Promote to memory with the remaining disk lifetime
+            self._store(key, value, time.monotonic() + remaining)
+            return value
+
+    def _set_disk(self, key, value, ttl: float):
+        with self._lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), time.time() + ttl)
+                )
+                self._db.commit()
+            except (TypeError, sqlite3.Error) as e:
+                logger.warning(f"{self.name}: disk cache write failed: {e}")
+                return
+            self._writes += 1
+        # Trim often enough that the table never grows much past max_rows
+        if self._writes >= max(1, self.max_rows // 10) or time.monotonic() - self._last_purge >= PURGE_INTERVAL:
+            self.purge_expired()
+
+    def _store(self, key, value, expires: float):
+        self._data[key] = (expires, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache")
+                self._db.commit()
+
+    def purge_expired(self):
+        """Drop expired rows from the disk tier, then the soonest-expiring beyond max_rows"""
+        if self._db is None:
+            return
+        with self._lock:
+            self._last_purge = time.monotonic()
+            self._writes = 0
+            try:
+                self._db.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+                self._db.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+                    (self.max_rows,)
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"{self.name}: disk cache purge failed: {e}")
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent async calls for the same key into one.
+
+    The first caller for a key runs the coroutine; callers arriving while
+    it is in flight await the same result instead of repeating the work.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._inflight = {}
+
+    async def do(self, key, coro_fn):
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(coro_fn())
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._forget(key, t))
+        # shield() keeps the shared call alive if this caller is cancelled
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
@@ -1,55 +1,241 @@
 from langchain.tools import tool
+from typing import Optional
+import os
 import ast
+import math
+import functools
 import operator as op
 
+# Limits that keep a single expression from pinning the CPU
+MAX_EXPRESSION_LENGTH = int(os.environ.get("CALC_MAX_EXPRESSION_LENGTH", "1000"))
+MAX_RESULT_BITS = int(os.environ.get("CALC_MAX_RESULT_BITS", "10000"))
+MAX_FACTORIAL = 1000
+COMPILE_CACHE_SIZE = int(os.environ.get("CALC_CACHE_SIZE", "512"))
+
 # Supported operators
 allowed_operators = {
     ast.Add: op.add,
     ast.Sub: op.sub,
     ast.Mult: op.mul,
     ast.Div: op.truediv,
+    ast.FloorDiv: op.floordiv,
     ast.Mod: op.mod,
     ast.Pow: op.pow,
-    ast.USub: op.neg
+    ast.USub: op.neg,
+    ast.UAdd: op.pos
 }
 
 
-def safe_eval(expr):
+def _result_bits(value) -> float:
+    return math.log2(abs(value)) if value else 0.0
+
+
+def _checked_pow(base, exponent):
+    """`base ** exponent`, refused up front when an integer result would be huge"""
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0:
+        if exponent * _result_bits(base) > MAX_RESULT_BITS:
+            raise ValueError("Result too large")
+    return op.pow(base, exponent)
+
+
+def _checked_mul(left, right):
+    if isinstance(left, int) and isinstance(right, int):
+        if _result_bits(left) + _result_bits(right) > MAX_RESULT_BITS:
+            raise ValueError("Result too large")
+    return op.mul(left, right)
+
+
+def _checked_factorial(n):
+    if n > MAX_FACTORIAL:
+        raise ValueError(f"factorial() is limited to n <= {MAX_FACTORIAL}")
+    return math.factorial(n)
+
+
+# Whitelisted functions and constants
+functions = {
+    "abs": abs, "round": round, "min": min, "max": max,
+    "sqrt": math.sqrt, "cbrt": math.cbrt, "exp": math.exp,
+    "log": math.log, "log10": math.log10, "log2": math.log2,
+    "sin": math.sin, "cos": math.cos, "tan": math.tan,
+    "asin": math.asin, "acos": math.acos, "atan": math.atan, "atan2": math.atan2,
+    "sinh": math.sinh, "cosh": math.cosh, "tanh": math.tanh,
+    "degrees": math.degrees, "radians": math.radians, "hypot": math.hypot,
+    "floor": math.floor, "ceil": math.ceil,
+    "gcd": math.gcd, "lcm": math.lcm, "factorial": _checked_factorial,
+}
+constants = {"pi": math.pi, "e": math.e, "tau": math.tau}
+
+@functools.lru_cache(maxsize=1)
+def _numpy():
+    """
+    NumPy and its equivalents of `functions`, used when variables are bound
+    to arrays; (None, {}) without NumPy. Imported on first batch evaluation.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return None, {}
+    vector_functions = {
+        "abs": np.abs, "round": np.round,
+        "min": lambda *args: functools.reduce(np.minimum, args),
+        "max": lambda *args: functools.reduce(np.maximum, args),
+        "sqrt": np.sqrt, "cbrt": np.cbrt, "exp": np.exp,
+        "log": np.log, "log10": np.log10, "log2": np.log2,
+        "sin": np.sin, "cos": np.cos, "tan": np.tan,
+        "asin": np.arcsin, "acos": np.arccos, "atan": np.arctan, "atan2": np.arctan2,
+        "sinh": np.sinh, "cosh": np.cosh, "tanh": np.tanh,
+        "degrees": np.degrees, "radians": np.radians, "hypot": np.hypot,
+        "floor": np.floor, "ceil": np.ceil,
+    }
+    return np, vector_functions
+
+
+class _Validator(ast.NodeVisitor):
+    """Reject anything that is not arithmetic on numbers, names and whitelisted calls"""
+
+    def __init__(self):
+        self.names = set()
+        self.calls = set()
+
+    def generic_visit(self, node):
+        raise TypeError(f"Unsupported expression: {type(node).__name__}")
+
+    def visit_Expression(self, node):
+        self.visit(node.body)
+
+    def visit_Constant(self, node):
+        if type(node.value) not in (int, float):
+            raise TypeError(f"Unsupported constant: {node.value!r}")
+
+    def visit_BinOp(self, node):
+        if type(node.op) not in allowed_operators:
+            raise ValueError(f"Operator {type(node.op).__name__} not allowed")
+        self.visit(node.left)
+        self.visit(node.right)
+
+    def visit_UnaryOp(self, node):
+        if type(node.op) not in allowed_operators:
+            raise ValueError(f"Operator {type(node.op).__name__} not allowed")
+        self.visit(node.operand)
+
+    def visit_Name(self, node):
+        if node.id in functions:
+            raise TypeError(f"{node.id} must be called")
+        self.names.add(node.id)
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in functions:
+            raise ValueError(f"Function {ast.unparse(node.func)} not allowed")
+        if node.keywords:
+            raise ValueError("Keyword arguments are not supported")
+        self.calls.add(node.func.id)
+        for arg in node.args:
+            self.visit(arg)
+
+
+class _Guard(ast.NodeTransformer):
+    """Route ** and * through the size-checked helpers"""
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        helper = {ast.Pow: "_pow", ast.Mult: "_mul"}.get(type(node.op))
+        if helper is None:
+            return node
+        return ast.copy_location(
+            ast.Call(func=ast.Name(id=helper, ctx=ast.Load()), args=[node.left, node.right], keywords=[]),
+            node
+        )
+
+
+@functools.lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def compile_expression(expr: str):
+    """
+    Validate `expr` once and compile it to a code object.
+    Returns (code, free names, called functions); repeated expressions come
+    from the LRU cache.
+    """
+    if len(expr) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"Expression longer than {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(expr.strip(), mode="eval")
+    except (SyntaxError, RecursionError, MemoryError) as e:
+        raise ValueError(f"Invalid expression: {e}") from None
+
+    validator = _Validator()
+    validator.visit(tree)
+    tree = ast.fix_missing_locations(_Guard().visit(tree))
+    code = compile(tree, "<calculate>", "eval")
+    return code, frozenset(validator.names - constants.keys()), frozenset(validator.calls)
+
+
+def _namespace(variables: dict, vectorized: bool = False) -> dict:
+    namespace = {"__builtins__": {}, "_pow": _checked_pow, "_mul": _checked_mul}
+    namespace.update(_numpy()[1] if vectorized else functions)
+    namespace.update(constants)
+    namespace.update(variables)
+    return namespace
+
+
+def _check_names(names: frozenset, variables: dict):
+    unknown = names - variables.keys()
+    if unknown:
+        raise ValueError(f"Unknown name(s): {', '.join(sorted(unknown))}")
+
+
+def safe_eval(expr, variables: dict = None):
     """
     Safely evaluate arithmetic expressions.
-    Supports +, -, *, /, %, **, parentheses, and unary minus.
+    Supports +, -, *, /, //, %, **, parentheses, unary minus, the constants
+    pi, e and tau, whitelisted math functions and optional named variables.
+    """
+    code, names, _ = compile_expression(expr)
+    variables = variables or {}
+    _check_names(names, variables)
+    return eval(code, _namespace(variables))
+
+
+def evaluate_batch(expr: str, variables: dict) -> list:
+    """
+    Evaluate `expr` once for every row of `variables`, given as columns
+    ({"x": [1, 2, 3]}). With NumPy this is a single vectorized call.
     """
+    code, names, calls = compile_expression(expr)
+    _check_names(names, variables)
+    columns = {name: list(values) for name, values in variables.items()}
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError("All variables need the same number of values")
 
-    def _eval(node):
-        if isinstance(node, ast.Num):  # <number>
-            return node.n
-        elif isinstance(node, ast.BinOp):  # <left> <op> <right>
-            if type(node.op) not in allowed_operators:
-                raise ValueError(f"Operator {type(node.op)} not allowed")
-            return allowed_operators[type(node.op)](_eval(node.left), _eval(node.right))
-        elif isinstance(node, ast.UnaryOp):  # - <operand>
-            if type(node.op) not in allowed_operators:
-                raise ValueError(f"Operator {type(node.op)} not allowed")
-            return allowed_operators[type(node.op)](_eval(node.operand))
-        else:
-            raise TypeError(f"Unsupported expression: {node}")
+    np, vector_functions = _numpy()
+    if np is not None and calls <= vector_functions.keys():
+        arrays = {name: np.asarray(values, dtype=float) for name, values in columns.items()}
+        with np.errstate(all="ignore"):
+            result = eval(code, _namespace(arrays, vectorized=True))
+        rows = lengths.pop() if lengths else 1
+        return np.broadcast_to(result, (rows,)).tolist()
 
-    node = ast.parse(expr, mode="eval").body
-    return _eval(node)
+    rows = zip(*columns.values()) if columns else [()]
+    return [eval(code, _namespace(dict(zip(columns, row)))) for row in rows]
 
 
 @tool
-def calculate(expression: str) -> str:
+def calculate(expression: str, variables: Optional[dict[str, list[float]]] = None) -> str:
     """
     Safely calculate a mathematical expression and return the result as a string.
 
     Example usage:
     calculate("2 + 3 * (4 - 1)") -> "11"
+    calculate("sqrt(x**2 + y**2)", {"x": [3, 5], "y": [4, 12]}) -> "[5.0, 13.0]"
 
-    Only supports arithmetic operations: +, -, *, /, %, **, parentheses, and unary minus.
+    Supports +, -, *, /, //, %, **, parentheses, unary minus, pi, e, tau and the
+    functions sqrt, cbrt, exp, log, log10, log2, sin, cos, tan, asin, acos, atan,
+    atan2, sinh, cosh, tanh, degrees, radians, hypot, floor, ceil, abs, round,
+    min, max, gcd, lcm and factorial. Pass `variables` (name -> list of values)
+    to evaluate the expression for every set of values at once.
     """
     try:
-        result = safe_eval(expression)
-        return str(result)
+        if variables:
+            return str(evaluate_batch(expression, variables))
+        return str(safe_eval(expression))
     except Exception as e:
         return f"Error: {e}"
@@ -1,34 +1,227 @@
 from langchain.tools import tool
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.date import DateTrigger
-from apscheduler.triggers.cron import CronTrigger
+from langchain_core.runnables import RunnableConfig
+from tools.context import chat_id_from
+from tools.scheduler import AsyncScheduler
 from datetime import datetime, timedelta
 from dateutil import parser
-import asyncio
+import os
+import sqlite3
+import threading
+import time
 import pytz
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Scheduler setup
-scheduler = BackgroundScheduler(timezone=pytz.UTC)
-scheduler.start()
+# Durable job store: every reminder is a row; the scheduler only holds the
+# jobs due within LOAD_HORIZON, topped up by a periodic loader, so startup
+# and memory stay bounded however many reminders are stored
+REMINDERS_DB_PATH = os.environ.get("REMINDERS_DB_PATH", "reminders.sqlite")
+MISFIRE_GRACE = float(os.environ.get("REMINDER_MISFIRE_GRACE", "300"))
+LOAD_HORIZON = 3600
+LOAD_INTERVAL = 900
+LOADER_JOB_ID = "_reminder_loader"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reminders (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id TEXT NOT NULL DEFAULT '',
+    kind TEXT NOT NULL,
+    text TEXT NOT NULL,
+    run_at REAL NOT NULL,
+    pattern TEXT,
+    timezone TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reminders_run_at ON reminders (run_at);
+"""
+
+# Chat -> reminders index; list/cancel/clear only touch one chat's rows
+CHAT_INDEX = "CREATE INDEX IF NOT EXISTS idx_reminders_chat ON reminders (chat_id, seq)"
+
+# Scheduler setup; runs on the bot's event loop once start_reminders() is called
+scheduler = AsyncScheduler()
 
 # Global state
 telegram_callback = None
-main_event_loop = None
-reminders = {}
+# Predicate on chat_id; with several worker processes each one only
+# schedules the reminders of the chats it owns
+_owns = None
+_conn = None
+_lock = threading.Lock()
+
+
+def _db() -> sqlite3.Connection:
+    """Open the reminder store on first use"""
+    global _conn
+    with _lock:
+        if _conn is None:
+            conn = sqlite3.connect(REMINDERS_DB_PATH, check_same_thread=False, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            # Stores created before reminders were owned by a chat
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(reminders)")}
+            if "chat_id" not in columns:
+                conn.execute("ALTER TABLE reminders ADD COLUMN chat_id TEXT NOT NULL DEFAULT ''")
+            conn.execute(CHAT_INDEX)
+            conn.commit()
+            _conn = conn
+    return _conn
+
+
+def _reminder_id(row) -> str:
+    """Public ID; AUTOINCREMENT never reuses seq, so IDs never collide"""
+    return f"{'rec' if row['kind'] == 'recurring' else 'r'}_{row['seq']}"
+
+
+def _seq(reminder_id: str):
+    prefix, _, seq = reminder_id.strip().partition("_")
+    if prefix not in ("r", "rec") or not seq.isdigit():
+        return None
+    return int(seq)
+
+
+def start_reminders(callback, owns=None) -> int:
+    """
+    Start reminder delivery on the running event loop (call from the app's
+    post_init hook). `callback(chat_id, msg)` is the coroutine that sends
+    a reminder; `owns(chat_id)`, if given, limits delivery to those chats.
+    Returns the number of stored reminders.
+    """
+    global telegram_callback, _owns
+    telegram_callback = callback
+    _owns = owns
+    scheduler.start()
+    return recover_reminders()
 
 
-def set_telegram_callback(callback):
-    """Register callback for sending reminders"""
-    global telegram_callback, main_event_loop
-    telegram_callback = callback
-    # Capture the main event loop when callback is registered
+def stop_reminders():
+    """Drop in-memory timers; stored reminders are reloaded on next start"""
+    global telegram_callback
+    telegram_callback = None
+    scheduler.shutdown()
+
+
+def _deliver(chat_id: str, msg: str):
+    """Send a reminder from the event loop"""
+    if not chat_id:
+        logger.error(f"Reminder without an owning chat dropped: {msg}")
+    elif telegram_callback and scheduler.running:
+        scheduler.spawn(telegram_callback(chat_id, msg))
+    else:
+        logger.error("Main event loop not available")
+
+
+def _schedule(row):
+    """Put one stored reminder on the in-memory scheduler"""
+    scheduler.add_job(_reminder_id(row), row["run_at"], _fire, row["seq"])
+
+
+def _next_run(row, after: datetime):
+    """Next fire time of a recurring reminder, or None"""
+    trigger = _parse_pattern(row["pattern"], pytz.timezone(row["timezone"]))
+    return trigger.get_next_fire_time(None, after)
+
+
+def _fire(seq: int):
     try:
-        main_event_loop = asyncio.get_running_loop()
-    except RuntimeError:
-        main_event_loop = asyncio.get_event_loop()
+        conn = _db()
+        with _lock:
+            row = conn.execute("SELECT * FROM reminders WHERE seq = ?", (seq,)).fetchone()
+        if row is None:
+            return  # cancelled meanwhile
+
+        if row["kind"] == "recurring":
+            _deliver(row["chat_id"], f"🔔 {row['text']}")
+            _reschedule_recurring(row, datetime.now(pytz.UTC))
+        else:
+            _deliver(row["chat_id"], f"⏰ {row['text']}")
+            with _lock:
+                conn.execute("DELETE FROM reminders WHERE seq = ?", (seq,))
+                conn.commit()
+    except Exception as e:
+        logger.error(f"Error sending reminder: {e}")
+
+
+def _reschedule_recurring(row, after: datetime):
+    conn = _db()
+    # Timers run on the loop's monotonic clock and may fire while the wall
+    # clock still reads just before run_at; never pick the slot that just fired
+    after = max(after, datetime.fromtimestamp(row["run_at"] + 1, pytz.UTC))
+    next_run = _next_run(row, after)
+    with _lock:
+        if next_run is None:
+            conn.execute("DELETE FROM reminders WHERE seq = ?", (row["seq"],))
+        else:
+            conn.execute("UPDATE reminders SET run_at = ? WHERE seq = ?", (next_run.timestamp(), row["seq"]))
+        conn.commit()
+    if next_run is not None and next_run.timestamp() <= time.time() + LOAD_HORIZON:
+        _schedule({**dict(row), "run_at": next_run.timestamp()})
+
+
+def sync_reminders() -> int:
+    """
+    Schedule stored reminders that fall inside the load horizon and settle
+    those whose time passed while they were not scheduled: one-shot
+    reminders missed by less than MISFIRE_GRACE seconds are delivered,
+    older ones dropped, and recurring ones advanced. Returns the number
+    of missed reminders.
+    """
+    conn = _db()
+    now = time.time()
+    with _lock:
+        rows = conn.execute(
+            "SELECT * FROM reminders WHERE run_at <= ? ORDER BY run_at",
+            (now + LOAD_HORIZON,)
+        ).fetchall()
+
+    missed = 0
+    for row in rows:
+        if scheduler.has_job(_reminder_id(row)) or (_owns and not _owns(row["chat_id"])):
+            continue
+        if row["run_at"] >= now:
+            _schedule(row)
+            continue
+
+        missed += 1
+        if row["kind"] == "recurring":
+            _reschedule_recurring(row, datetime.now(pytz.UTC))
+        elif now - row["run_at"] <= MISFIRE_GRACE:
+            _fire(row["seq"])
+        else:
+            logger.warning(f"Dropping reminder {_reminder_id(row)}: missed by {_format_delta(timedelta(seconds=now - row['run_at']))}")
+            with _lock:
+                conn.execute("DELETE FROM reminders WHERE seq = ?", (row["seq"],))
+                conn.commit()
+    return missed
+
+
+def recover_reminders() -> int:
+    """Startup pass: reload pending reminders and start the periodic loader"""
+    missed = sync_reminders()
+    scheduler.add_interval_job(LOADER_JOB_ID, LOAD_INTERVAL, sync_reminders)
+
+    conn = _db()
+    with _lock:
+        count = conn.execute("SELECT COUNT(*) FROM reminders").fetchone()[0]
+    logger.info(f"Recovered reminder store: {count} pending, {missed} missed during downtime")
+    return count
+
+
+def _insert(chat_id: str, kind: str, text: str, run_at: datetime, pattern, timezone: str):
+    conn = _db()
+    with _lock:
+        cursor = conn.execute(
+            "INSERT INTO reminders (chat_id, kind, text, run_at, pattern, timezone, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (chat_id, kind, text, run_at.timestamp(), pattern, timezone, time.time())
+        )
+        conn.commit()
+        row = conn.execute("SELECT * FROM reminders WHERE seq = ?", (cursor.lastrowid,)).fetchone()
+    if row["run_at"] <= time.time() + LOAD_HORIZON:
+        _schedule(row)
+    return row
 
 
 @tool
@@ -42,11 +235,11 @@ def get_current_time(timezone: str = "UTC") -> str:
 
 
 @tool
-def set_reminder(text: str, when: str, timezone: str = "UTC") -> str:
+def set_reminder(text: str, when: str, timezone: str = "UTC", config: RunnableConfig = None) -> str:
     """
     Set a reminder. Examples: '5m', 'in 2 hours', 'tomorrow at 3pm', '2024-12-25 10:00'
     """
-    if not telegram_callback:
+    if not telegram_callback or not scheduler.running:
         return "❌ Bot not ready"
 
     try:
@@ -56,24 +249,10 @@ def set_reminder(text: str, when: str, timezone: str = "UTC") -> str:
         if run_time <= datetime.now(tz):
             return "❌ Time must be in the future"
 
-        reminder_id = f"r_{len(reminders) + 1}"
-
-        def send_reminder():
-            try:
-                # Use the captured main event loop
-                if main_event_loop and main_event_loop.is_running():
-                    asyncio.run_coroutine_threadsafe(telegram_callback(f"⏰ {text}"), main_event_loop)
-                else:
-                    logger.error("Main event loop not available")
-                reminders.pop(reminder_id, None)
-            except Exception as e:
-                logger.error(f"Error sending reminder: {e}")
-
-        scheduler.add_job(send_reminder, DateTrigger(run_date=run_time), id=reminder_id)
-        reminders[reminder_id] = {"text": text, "time": run_time, "type": "once"}
+        row = _insert(chat_id_from(config), "once", text, run_time, None, timezone)
 
         time_until = run_time - datetime.now(tz)
-        return f"✅ Reminder set for {run_time.strftime('%b %d at %I:%M %p')} ({_format_delta(time_until)})"
+        return f"✅ Reminder {_reminder_id(row)} set for {run_time.strftime('%b %d at %I:%M %p')} ({_format_delta(time_until)})"
 
     except ValueError as e:
         return f"❌ {str(e)}"
@@ -83,32 +262,20 @@ def set_reminder(text: str, when: str, timezone: str = "UTC") -> str:
 
 
 @tool
-def set_recurring_reminder(text: str, pattern: str, timezone: str = "UTC") -> str:
+def set_recurring_reminder(text: str, pattern: str, timezone: str = "UTC", config: RunnableConfig = None) -> str:
     """
     Set recurring reminder. Examples: 'daily at 9am', 'every monday at 10am', 'every hour'
     """
-    if not telegram_callback:
+    if not telegram_callback or not scheduler.running:
         return "❌ Bot not ready"
 
     try:
         tz = pytz.timezone(timezone)
         trigger = _parse_pattern(pattern, tz)
-        reminder_id = f"rec_{len(reminders) + 1}"
+        next_run = trigger.get_next_fire_time(None, datetime.now(tz))
+        row = _insert(chat_id_from(config), "recurring", text, next_run, pattern, timezone)
 
-        def send_reminder():
-            try:
-                # Use the captured main event loop
-                if main_event_loop and main_event_loop.is_running():
-                    asyncio.run_coroutine_threadsafe(telegram_callback(f"🔔 {text}"), main_event_loop)
-                else:
-                    logger.error("Main event loop not available")
-            except Exception as e:
-                logger.error(f"Error sending recurring reminder: {e}")
-
-        job = scheduler.add_job(send_reminder, trigger, id=reminder_id)
-        reminders[reminder_id] = {"text": text, "pattern": pattern, "type": "recurring"}
-
-        return f"✅ Recurring: {pattern}\n⏰ Next: {job.next_run_time.strftime('%b %d at %I:%M %p')}"
+        return f"✅ Recurring {_reminder_id(row)}: {pattern}\n⏰ Next: {next_run.strftime('%b %d at %I:%M %p')}"
 
     except Exception as e:
         logger.error(f"Error: {e}")
@@ -116,55 +283,62 @@ def set_recurring_reminder(text: str, pattern: str, timezone: str = "UTC") -> st
 
 
 @tool
-def list_reminders() -> str:
-    """List all active reminders"""
-    if not reminders:
+def list_reminders(config: RunnableConfig = None) -> str:
+    """List this chat's active reminders"""
+    conn = _db()
+    with _lock:
+        rows = conn.execute(
+            "SELECT * FROM reminders WHERE chat_id = ? ORDER BY run_at", (chat_id_from(config),)
+        ).fetchall()
+    if not rows:
         return "📭 No reminders"
 
     lines = ["📋 Active Reminders:\n"]
-    jobs = scheduler.get_jobs()
-
-    for job in jobs:
-        if job.id in reminders:
-            info = reminders[job.id]
-            next_run = job.next_run_time
-
-            if info["type"] == "recurring":
-                lines.append(f"🔔 {job.id}: {info['text']}")
-                lines.append(f"   Pattern: {info['pattern']}")
-            else:
-                lines.append(f"⏰ {job.id}: {info['text']}")
-                lines.append(f"   Time: {info['time'].strftime('%b %d at %I:%M %p')}")
-
-            if next_run:
-                delta = next_run - datetime.now(pytz.UTC)
-                lines.append(f"   Next: {_format_delta(delta)}\n")
+    now = datetime.now(pytz.UTC)
+
+    for row in rows:
+        next_run = datetime.fromtimestamp(row["run_at"], pytz.timezone(row["timezone"]))
+        if row["kind"] == "recurring":
+            lines.append(f"🔔 {_reminder_id(row)}: {row['text']}")
+            lines.append(f"   Pattern: {row['pattern']}")
+        else:
+            lines.append(f"⏰ {_reminder_id(row)}: {row['text']}")
+            lines.append(f"   Time: {next_run.strftime('%b %d at %I:%M %p')}")
+        lines.append(f"   Next: {_format_delta(next_run - now)}\n")
 
     return "\n".join(lines)
 
 
 @tool
-def cancel_reminder(reminder_id: str) -> str:
+def cancel_reminder(reminder_id: str, config: RunnableConfig = None) -> str:
     """Cancel a reminder by ID (e.g., 'r_1' or 'rec_2')"""
-    if reminder_id not in reminders:
-        return f"❌ '{reminder_id}' not found"
+    seq = _seq(reminder_id)
+    conn = _db()
+    with _lock:
+        row = conn.execute(
+            "SELECT * FROM reminders WHERE seq = ? AND chat_id = ?", (seq, chat_id_from(config))
+        ).fetchone() if seq else None
+        if row is None or _reminder_id(row) != reminder_id.strip():
+            return f"❌ '{reminder_id}' not found"
+        conn.execute("DELETE FROM reminders WHERE seq = ?", (seq,))
+        conn.commit()
 
-    try:
-        scheduler.remove_job(reminder_id)
-        text = reminders.pop(reminder_id)["text"]
-        return f"✅ Cancelled: {text}"
-    except Exception as e:
-        logger.error(f"Error: {e}")
-        return "❌ Failed to cancel"
+    scheduler.remove_job(_reminder_id(row))
+    return f"✅ Cancelled: {row['text']}"
 
 
 @tool
-def clear_all_reminders() -> str:
-    """Clear all reminders"""
-    count = len(reminders)
-    scheduler.remove_all_jobs()
-    reminders.clear()
-    return f"✅ Cleared {count} reminder(s)"
+def clear_all_reminders(config: RunnableConfig = None) -> str:
+    """Clear all of this chat's reminders"""
+    chat_id = chat_id_from(config)
+    conn = _db()
+    with _lock:
+        rows = conn.execute("SELECT seq, kind FROM reminders WHERE chat_id = ?", (chat_id,)).fetchall()
+        conn.execute("DELETE FROM reminders WHERE chat_id = ?", (chat_id,))
+        conn.commit()
+    for row in rows:
+        scheduler.remove_job(_reminder_id(row))
+    return f"✅ Cleared {len(rows)} reminder(s)"
 
 
 # Helpers
@@ -223,8 +397,11 @@ def _parse_time(when: str, tz: pytz.timezone) -> datetime:
         raise ValueError("Try: '30s', '5m', 'in 2 hours', 'tomorrow at 3pm', or '2024-12-25 10:00'")
 
 
-def _parse_pattern(pattern: str, tz: pytz.timezone) -> CronTrigger:
+def _parse_pattern(pattern: str, tz: pytz.timezone):
     """Parse recurring pattern into CronTrigger"""
+    # Only recurring reminders need APScheduler; import it on first use
+    from apscheduler.triggers.cron import CronTrigger
+
     pattern = pattern.lower().strip()
 
     # Daily
@@ -0,0 +1,10 @@
+from langchain_core.runnables import RunnableConfig
+
+DEFAULT_CHAT = "default"
+
+
+def chat_id_from(config: RunnableConfig) -> str:
+    """Chat that owns the current run (the graph's thread_id)"""
+    if not config:
+        return DEFAULT_CHAT
+    return str(config.get("configurable", {}).get("thread_id") or DEFAULT_CHAT)
@@ -0,0 +1,73 @@
+import os
+import logging
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Pool configuration (overridable through the environment)
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "60"))
+
+HEADERS = {"User-Agent": "Telegram-Gaia-Agent/1.0"}
+
+# HTTP/2 needs the optional `h2` package (pip install httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+# Shared clients, created lazily or by start() and closed by aclose()
+_client = None
+_async_client = None
+
+
+def _client_kwargs() -> dict:
+    return {
+        "headers": HEADERS,
+        "http2": HTTP2,
+        "timeout": httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        ),
+    }
+
+
+def get_client() -> httpx.Client:
+    """Shared keep-alive client for the synchronous tool variants"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.Client(**_client_kwargs())
+    return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for the async tool variants"""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(**_client_kwargs())
+    return _async_client
+
+
+def start():
+    """Open both pools up front (called from the app's post_init hook)"""
+    get_client()
+    get_async_client()
+    logger.info(f"HTTP pools started (http2={HTTP2}, max_connections={HTTP_MAX_CONNECTIONS})")
+
+
+async def aclose():
+    """Close both pools (called from the app's post_shutdown hook)"""
+    global _client, _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _client is not None:
+        _client.close()
+        _client = None
+    logger.info("HTTP pools closed")
@@ -1,34 +1,204 @@
-from langchain.tools import tool
+from langchain_core.tools import StructuredTool
+from langchain_core.runnables import RunnableConfig
+from tools.context import chat_id_from
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
 
+logger = logging.getLogger(__name__)
+
+NOTES_DB_PATH = os.environ.get("NOTES_DB_PATH", "notes.sqlite")
+NOTES_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+
+# Legacy append-only file; imported once into the chat NOTES_LEGACY_CHAT_ID
 NOTES_FILE = "notes.txt"
+NOTES_LEGACY_CHAT_ID = os.environ.get("NOTES_LEGACY_CHAT_ID")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY,
+    chat_id TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_notes_chat ON notes (chat_id, id);
+CREATE TABLE IF NOT EXISTS notes_meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(content, content='notes', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS notes_ai AFTER INSERT ON notes BEGIN
+    INSERT INTO notes_fts (rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS notes_ad AFTER DELETE ON notes BEGIN
+    INSERT INTO notes_fts (notes_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+"""
+
+_conn = None
+_has_fts = False
+_lock = threading.Lock()
+
+
+def _db() -> sqlite3.Connection:
+    """Open the notes database on first use"""
+    global _conn, _has_fts
+    if _conn is not None:
+        return _conn
+    with _lock:
+        if _conn is None:
+            conn = sqlite3.connect(NOTES_DB_PATH, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            try:
+                conn.executescript(FTS_SCHEMA)
+                _has_fts = True
+            except sqlite3.OperationalError:
+                logger.warning("SQLite built without FTS5; search_notes falls back to LIKE")
+            conn.commit()
+            _conn = conn
+    if NOTES_LEGACY_CHAT_ID:
+        import_legacy_notes(NOTES_FILE, NOTES_LEGACY_CHAT_ID)
+    return _conn
+
+
+def import_legacy_notes(path: str, chat_id: str) -> int:
+    """One-shot import of the old notes.txt into `chat_id`'s notes"""
+    conn = _db()
+    with _lock:
+        # Take the write lock before checking, so only one worker process imports
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("SELECT 1 FROM notes_meta WHERE key = 'legacy_imported'").fetchone():
+            conn.rollback()
+            return 0
+        try:
+            with open(path, "r") as f:
+                lines = [line.strip() for line in f if line.strip()]
+        except FileNotFoundError:
+            lines = []
+        now = time.time()
+        conn.executemany(
+            "INSERT INTO notes (chat_id, content, created_at) VALUES (?, ?, ?)",
+            [(str(chat_id), line, now) for line in lines]
+        )
+        conn.execute("INSERT INTO notes_meta (key, value) VALUES ('legacy_imported', ?)", (str(now),))
+        conn.commit()
+    logger.info(f"Imported {len(lines)} notes from {path} into chat {chat_id}")
+    return len(lines)
 
-@tool
-def add_note(note: str) -> str:
+
+def _fts_query(query: str) -> str:
+    # Quote every word so user input cannot inject FTS syntax
+    words = re.findall(r"\w+", query)
+    return " OR ".join(f'"{w}"' for w in words)
+
+
+def _format(rows: list) -> str:
+    return "\n".join(f"#{row[0]}: {row[1]}" for row in rows)
+
+
+def _add_note(note: str, config: RunnableConfig) -> str:
     """
-    Add a note to the persistent notes file.
+    Save a note for this chat.
 
     Example usage:
-    add_note("Buy groceries") -> "Note added."
-
-    The note is appended to a text file named 'notes.txt'.
+    add_note("Buy groceries") -> "Note #12 added."
     """
-    with open(NOTES_FILE, "a") as f:
-        f.write(note + "\n")
-    return "Note added."
+    conn = _db()
+    with _lock:
+        cursor = conn.execute(
+            "INSERT INTO notes (chat_id, content, created_at) VALUES (?, ?, ?)",
+            (chat_id_from(config), note, time.time())
+        )
+        conn.commit()
+    return f"Note #{cursor.lastrowid} added."
 
-@tool
-def get_notes(_) -> str:
+
+def _get_notes(config: RunnableConfig, limit: int = NOTES_PAGE_SIZE, offset: int = 0) -> str:
     """
-    Retrieve all notes stored in the persistent notes file.
+    List this chat's notes, newest first, one page at a time.
 
     Example usage:
-    get_notes("") -> "Buy groceries\nCall Alice\n..."
+    get_notes() -> "Notes 1-10 of 42:\n#42: Buy groceries\n..."
+    get_notes(offset=10) -> the next page
 
     If no notes are found, returns "No notes found."
+    Use search_notes instead when looking for something specific.
     """
-    try:
-        with open(NOTES_FILE, "r") as f:
-            notes = f.readlines()
-        return "".join(notes) if notes else "No notes found."
-    except FileNotFoundError:
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    offset = max(0, offset)
+    chat_id = chat_id_from(config)
+    conn = _db()
+    with _lock:
+        total = conn.execute("SELECT COUNT(*) FROM notes WHERE chat_id = ?", (chat_id,)).fetchone()[0]
+        rows = conn.execute(
+            "SELECT id, content FROM notes WHERE chat_id = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+            (chat_id, limit, offset)
+        ).fetchall()
+    if not rows:
         return "No notes found."
+    return f"Notes {offset + 1}-{offset + len(rows)} of {total}:\n{_format(rows)}"
+
+
+def _search_notes(query: str, config: RunnableConfig, limit: int = 5) -> str:
+    """
+    Full-text search over this chat's notes, best matches first.
+
+    Example usage:
+    search_notes("groceries") -> "#12: Buy groceries\n..."
+
+    If nothing matches, returns "No matching notes."
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    chat_id = chat_id_from(config)
+    conn = _db()
+    with _lock:
+        fts_query = _fts_query(query)
+        if _has_fts and fts_query:
+            rows = conn.execute(
+                """SELECT notes.id, notes.content FROM notes_fts
+                   JOIN notes ON notes.id = notes_fts.rowid
+                   WHERE notes_fts MATCH ? AND notes.chat_id = ?
+                   ORDER BY bm25(notes_fts) LIMIT ?""",
+                (fts_query, chat_id, limit)
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT id, content FROM notes WHERE chat_id = ? AND content LIKE ? ORDER BY id DESC LIMIT ?",
+                (chat_id, f"%{query}%", limit)
+            ).fetchall()
+    return _format(rows) if rows else "No matching notes."
+
+
+async def _aadd_note(note: str, config: RunnableConfig) -> str:
+    """Async variant of `_add_note`; database I/O runs off the event loop"""
+    return await asyncio.to_thread(_add_note, note, config)
+
+
+async def _aget_notes(config: RunnableConfig, limit: int = NOTES_PAGE_SIZE, offset: int = 0) -> str:
+    """Async variant of `_get_notes`; database I/O runs off the event loop"""
+    return await asyncio.to_thread(_get_notes, config, limit, offset)
+
+
+async def _asearch_notes(query: str, config: RunnableConfig, limit: int = 5) -> str:
+    """Async variant of `_search_notes`; database I/O runs off the event loop"""
+    return await asyncio.to_thread(_search_notes, query, config, limit)
+
+
+add_note = StructuredTool.from_function(func=_add_note, coroutine=_aadd_note, name="add_note")
+get_notes = StructuredTool.from_function(func=_get_notes, coroutine=_aget_notes, name="get_notes")
+search_notes = StructuredTool.from_function(func=_search_notes, coroutine=_asearch_notes, name="search_notes")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m tools.notes <notes.txt> <chat_id>")
+    print(f"Imported {import_legacy_notes(sys.argv[1], sys.argv[2])} notes")
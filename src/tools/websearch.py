@@ -1,9 +1,45 @@
-from langchain.tools import tool
-import httpx
+from langchain_core.tools import StructuredTool
+from tools.http_client import get_client, get_async_client
+from tools.cache import TTLCache, SingleFlight, normalize_query
+import os
 
+SEARCH_URL = "https://api.duckduckgo.com/"
+SEARCH_TIMEOUT = 5
+NO_RESULT = "No good result found."
 
-@tool
-def web_search(query: str) -> str:
+# Results are cached per normalized query; empty answers are cached too,
+# but for a shorter time so new content can still show up
+CACHE_TTL = float(os.environ.get("WEB_SEARCH_CACHE_TTL", "3600"))
+NEGATIVE_CACHE_TTL = float(os.environ.get("WEB_SEARCH_NEGATIVE_TTL", "300"))
+CACHE_SIZE = int(os.environ.get("WEB_SEARCH_CACHE_SIZE", "1024"))
+
+cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL, name="web_search")
+inflight = SingleFlight()
+
+
+def _params(query: str) -> dict:
+    return {"q": query, "format": "json", "no_redirect": 1}
+
+
+def _summarize(data: dict) -> str:
+    abstract = data.get("AbstractText")
+    if abstract:
+        return abstract
+    # If no abstract, try first URL
+    related_topics = data.get("RelatedTopics")
+    if related_topics and isinstance(related_topics, list):
+        first = related_topics[0]
+        return first.get("Text", "No summary found.")
+    return NO_RESULT
+
+
+def _store(key: str, result: str) -> str:
+    ttl = NEGATIVE_CACHE_TTL if result == NO_RESULT else CACHE_TTL
+    cache.set(key, result, ttl=ttl)
+    return result
+
+
+def _web_search(query: str) -> str:
     """
     Perform a web search and return a summary of the first result.
 
@@ -13,18 +49,37 @@ def web_search(query: str) -> str:
     Returns:
         Summary of first result or fallback message
     """
-    url = f"https://api.duckduckgo.com/?q={query}&format=json&no_redirect=1"
+    key = normalize_query(query)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    try:
+        r = get_client().get(SEARCH_URL, params=_params(query), timeout=SEARCH_TIMEOUT)
+        return _store(key, _summarize(r.json()))
+    except Exception as e:
+        return f"Error searching web: {e}"
+
+
+async def _aweb_search(query: str) -> str:
+    """Async variant of `_web_search`; identical concurrent queries share one request"""
+    key = normalize_query(query)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    async def fetch():
+        r = await get_async_client().get(SEARCH_URL, params=_params(query), timeout=SEARCH_TIMEOUT)
+        return _store(key, _summarize(r.json()))
+
     try:
-        r = httpx.get(url, timeout=5)
-        data = r.json()
-        abstract = data.get("AbstractText")
-        if abstract:
-            return abstract
-        # If no abstract, try first URL
-        related_topics = data.get("RelatedTopics")
-        if related_topics and isinstance(related_topics, list):
-            first = related_topics[0]
-            return first.get("Text", "No summary found.")
-        return "No good result found."
+        return await inflight.do(key, fetch)
     except Exception as e:
         return f"Error searching web: {e}"
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters for sizing the cache"""
+    return {**cache.stats(), "coalesced": inflight.coalesced}
+
+
+web_search = StructuredTool.from_function(func=_web_search, coroutine=_aweb_search, name="web_search")
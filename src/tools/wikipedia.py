@@ -1,8 +1,80 @@
-from langchain.tools import tool
-import httpx
+from langchain_core.tools import StructuredTool
+from tools.http_client import get_client, get_async_client
+from tools.cache import TTLCache, normalize_query
+import os
+import asyncio
 
-@tool
-def wikipedia(query: str) -> str:
+WIKIPEDIA_API = "https://en.wikipedia.org/w/api.php"
+NOT_FOUND = "No Wikipedia article found"
+
+# Two key spaces: "q:<normalized query>" -> pageid and "p:<pageid>" -> extract, so
+# different phrasings of the same article share one cached extract.
+# Set WIKIPEDIA_CACHE_PATH to keep entries across restarts.
+CACHE_TTL = float(os.environ.get("WIKIPEDIA_CACHE_TTL", "86400"))
+# "No article" is cached too, but briefly, so a new or renamed article shows up
+NEGATIVE_CACHE_TTL = float(os.environ.get("WIKIPEDIA_NEGATIVE_TTL", "300"))
+CACHE_SIZE = int(os.environ.get("WIKIPEDIA_CACHE_SIZE", "2048"))
+CACHE_PATH = os.environ.get("WIKIPEDIA_CACHE_PATH") or None
+
+cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL, path=CACHE_PATH, name="wikipedia")
+
+
+def _params(query: str) -> dict:
+    # Search and fetch the intro of the best hit in one round trip
+    return {
+        "action": "query",
+        "generator": "search",
+        "gsrsearch": query,
+        "gsrlimit": 1,
+        "prop": "extracts",
+        "explaintext": True,
+        "exintro": True,
+        "format": "json",
+        "formatversion": 2
+    }
+
+
+def _cached(query: str):
+    """Return the cached extract for `query`, or None on a miss"""
+    page_id = cache.get(f"q:{normalize_query(query)}")
+    if page_id is None:
+        return None
+    if page_id == "":
+        return NOT_FOUND
+    return cache.get(f"p:{page_id}")
+
+
+async def _acached(query: str):
+    """`_cached` without blocking the event loop on the disk tier"""
+    page_id = await cache.aget(f"q:{normalize_query(query)}")
+    if page_id is None:
+        return None
+    if page_id == "":
+        return NOT_FOUND
+    return await cache.aget(f"p:{page_id}")
+
+
+def _store(query: str, data: dict) -> str:
+    """Extract the article text from an API response and cache it"""
+    if "error" in data:
+        # MediaWiki reports errors (ratelimited, maxlag, ...) with HTTP 200; never cache them
+        error = data["error"]
+        raise RuntimeError(f"{error.get('code', 'error')}: {error.get('info', '')}".rstrip(": "))
+    pages = data.get("query", {}).get("pages", [])
+    key = f"q:{normalize_query(query)}"
+    if not pages:
+        cache.set(key, "", ttl=NEGATIVE_CACHE_TTL)
+        return NOT_FOUND
+
+    page = min(pages, key=lambda p: p.get("index", 0))
+    page_id = str(page["pageid"])
+    extract = page.get("extract", "")
+    cache.set(f"p:{page_id}", extract)
+    cache.set(key, page_id)
+    return extract
+
+
+def _wikipedia(query: str) -> str:
     """
     Search Wikipedia for a given query and return the summary of the first matching article.
 
@@ -11,33 +83,29 @@ def wikipedia(query: str) -> str:
 
     If no article is found, returns "No Wikipedia article found".
     """
-    url = "https://en.wikipedia.org/w/api.php"
+    cached = _cached(query)
+    if cached is not None:
+        return cached
+    try:
+        response = get_client().get(WIKIPEDIA_API, params=_params(query))
+        response.raise_for_status()
+        return _store(query, response.json())
+    except Exception as e:
+        return f"Error: {e}"
+
+
+async def _awikipedia(query: str) -> str:
+    """Async variant of `_wikipedia` that does not block the event loop"""
+    cached = await _acached(query)
+    if cached is not None:
+        return cached
     try:
-        # Search for articles
-        response = httpx.get(
-            url,
-            params={"action": "query", "list": "search", "srsearch": query, "format": "json"},
-            headers={"User-Agent": "Telegram-Gaia-Agent/1.0"}
-        )
-        searches = response.json().get("query", {}).get("search", [])
-        if not searches:
-            return "No Wikipedia article found"
-
-        # Get first article summary
-        page_id = str(searches[0]["pageid"])
-        page = httpx.get(
-            url,
-            params={
-                "action": "query",
-                "prop": "extracts",
-                "explaintext": True,
-                "exintro": True,
-                "pageids": page_id,
-                "format": "json"
-            },
-            headers={"User-Agent": "Telegram-Gaia-Agent/1.0"}
-        ).json()
-
-        return page["query"]["pages"][page_id]["extract"]
+        response = await get_async_client().get(WIKIPEDIA_API, params=_params(query))
+        response.raise_for_status()
+        # Writes to the disk tier, if enabled, happen in a thread
+        return await asyncio.to_thread(_store, query, response.json())
     except Exception as e:
         return f"Error: {e}"
+
+
+wikipedia = StructuredTool.from_function(func=_wikipedia, coroutine=_awikipedia, name="wikipedia")
@@ -0,0 +1,239 @@
+"""
+Multi-process worker mode.
+
+With WORKERS=N, main.py runs a thin receiver: it takes updates from
+Telegram (polling or webhook) and forwards each one to worker process
+hash(chat_id) % N over that worker's queue. Each worker is a full bot
+(application, agent graph, dispatcher, debouncer, outbox, reminders) that
+only ever sees its own chats, so LLM response parsing, tool
+post-processing and tokenization for different chats run on different
+cores while every chat's messages are still handled in order by one
+process.
+
+Graceful restarts: a stop marker is queued behind the pending updates,
+the worker answers everything before it, waits up to WORKER_DRAIN_SECONDS
+for running agent runs, and exits; only then is its replacement started
+on the same queue, so nothing queued is lost or reordered. SIGHUP to the
+receiver restarts the workers one at a time (e.g. to pick up new code),
+and a worker that dies is restarted automatically on a fresh queue;
+updates it had taken or that were still queued for it are lost.
+
+Shared state lives in SQLite files in WAL mode with busy timeouts, so
+workers can use them concurrently. Each worker only schedules reminders
+for the chats it owns, and its outbox gets OUTBOX_GLOBAL_RATE / N of the
+send budget, so together the workers stay under Telegram's global flood
+limit (per-chat limits need no split, since a chat has one worker).
+"""
+import os
+import zlib
+import queue
+import signal
+import asyncio
+import logging
+import multiprocessing
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.environ.get("WORKERS", "0"))
+# How long a stopping worker waits for running agent runs before cancelling them
+WORKER_DRAIN_SECONDS = float(os.environ.get("WORKER_DRAIN_SECONDS", "30"))
+# How long the receiver waits for a stopping worker before killing it
+WORKER_STOP_TIMEOUT = WORKER_DRAIN_SECONDS + 15
+SUPERVISE_INTERVAL = 1.0
+
+# Queued after the pending updates to ask a worker to finish and exit
+STOP = None
+
+pool = None
+metrics_server = None
+
+
+def shard(chat_id, count: int) -> int:
+    """Worker index owning `chat_id`; stable across processes and restarts"""
+    return zlib.crc32(str(chat_id).encode()) % count
+
+
+class WorkerPool:
+    def __init__(self, size: int = WORKERS):
+        if size < 1:
+            raise ValueError("WorkerPool needs at least one worker")
+        # Workers start from a fresh interpreter; forking a process that
+        # already runs an event loop and HTTP threads is not safe
+        self._context = multiprocessing.get_context("spawn")
+        self.size = size
+        self.queues = [self._context.Queue() for _ in range(size)]
+        self.processes = [None] * size
+        self.restarts = 0
+        self._restarting = set()
+        self._stopping = False
+        self._supervisor = None
+
+    def start(self):
+        for index in range(self.size):
+            self._spawn(index)
+        self._supervisor = asyncio.create_task(self._supervise())
+
+    def _spawn(self, index: int):
+        process = self._context.Process(
+            target=worker_main, args=(index, self.size, self.queues[index]),
+            name=f"gaia-worker-{index}", daemon=False
+        )
+        process.start()
+        self.processes[index] = process
+        logger.info(f"Started worker {index} (pid {process.pid})")
+
+    def submit(self, chat_id, payload: dict):
+        """Queue one update (as a dict) for the worker owning `chat_id`"""
+        self.queues[shard(chat_id, self.size)].put(payload)
+
+    async def _stop_worker(self, index: int):
+        process = self.processes[index]
+        self.queues[index].put(STOP)
+        await asyncio.to_thread(process.join, WORKER_STOP_TIMEOUT)
+        if process.is_alive():
+            logger.warning(f"Worker {index} did not stop within {WORKER_STOP_TIMEOUT}s; terminating it")
+            process.terminate()
+            await asyncio.to_thread(process.join, 5)
+            if process.is_alive():
+                process.kill()
+                await asyncio.to_thread(process.join)
+
+    async def restart(self, index: int):
+        """Let worker `index` finish its queued updates, then replace it"""
+        self._restarting.add(index)
+        try:
+            await self._stop_worker(index)
+            self._spawn(index)
+            self.restarts += 1
+        finally:
+            self._restarting.discard(index)
+
+    async def rolling_restart(self):
+        """Restart the workers one at a time; the other shards keep being served"""
+        logger.info(f"Rolling restart of {self.size} workers")
+        for index in range(self.size):
+            await self.restart(index)
+
+    async def _supervise(self):
+        while not self._stopping:
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+            for index, process in enumerate(self.processes):
+                if self._stopping or index in self._restarting or process.is_alive():
+                    continue
+                logger.warning(f"Worker {index} exited with code {process.exitcode}; restarting it")
+                self._replace_queue(index)
+                self._spawn(index)
+                self.restarts += 1
+
+    def _replace_queue(self, index: int):
+        # A worker killed inside get() dies holding the queue's read lock, so
+        # its replacement could never read from it; updates still queued are lost
+        old = self.queues[index]
+        try:
+            lost = old.qsize()
+        except NotImplementedError:
+            lost = "an unknown number of"
+        if lost:
+            logger.warning(f"Dropping {lost} updates queued for crashed worker {index}")
+        old.cancel_join_thread()
+        old.close()
+        self.queues[index] = self._context.Queue()
+
+    async def stop(self):
+        """Drain and stop all workers"""
+        self._stopping = True
+        if self._supervisor:
+            self._supervisor.cancel()
+        await asyncio.gather(*(self._stop_worker(index) for index in range(self.size)))
+        for updates in self.queues:
+            updates.close()
+
+    def depths(self) -> dict:
+        """Updates waiting per worker (empty where the platform cannot tell)"""
+        try:
+            return {str(index): updates.qsize() for index, updates in enumerate(self.queues)}
+        except NotImplementedError:
+            return {}
+
+
+# Receiver side: the application only forwards updates
+
+async def forward(update, context):
+    """Hand a text update (messages and commands alike) to its chat's worker"""
+    pool.submit(update.effective_chat.id, update.to_dict())
+
+
+async def receiver_post_init(application):
+    global pool, metrics_server
+    pool = WorkerPool()
+    pool.start()
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.create_task(pool.rolling_restart()))
+    except (NotImplementedError, AttributeError):
+        logger.info("SIGHUP rolling restarts are not available on this platform")
+    metrics.gauge("gaia_worker_queued", pool.depths, "Updates waiting per worker", label="worker")
+    metrics.gauge("gaia_worker_restarts", lambda: pool.restarts, "Worker restarts since start")
+    metrics_server = await metrics.serve()
+    logger.info(f"Forwarding updates to {pool.size} workers")
+
+
+async def receiver_post_shutdown(application):
+    if metrics_server:
+        metrics_server.close()
+    if pool:
+        await pool.stop()
+
+
+# Worker side
+
+def worker_main(index: int, count: int, updates):
+    """Process entry point: serve the chats of shard `index` until STOP arrives"""
+    # Ctrl+C reaches the whole process group; the receiver decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve(index, count, updates))
+
+
+async def _serve(index: int, count: int, updates):
+    import main
+    from telegram import Update
+    from outbox import GLOBAL_RATE
+
+    application = main.build_application()
+    main.add_handlers(application)
+    await application.initialize()
+    # Worker i scrapes on METRICS_PORT + 1 + i; the receiver keeps METRICS_PORT
+    metrics_port = metrics.METRICS_PORT + 1 + index if metrics.METRICS_PORT else 0
+    await main.open_resources(
+        application.bot,
+        metrics_port=metrics_port,
+        owns=lambda chat_id: shard(chat_id, count) == index,
+        worker_name=f"{index + 1}/{count}",
+        global_rate=GLOBAL_RATE / count
+    )
+    await application.start()
+    logger.info(f"Worker {index} ready")
+    try:
+        while True:
+            payload = await asyncio.to_thread(_next, updates)
+            if payload is STOP:
+                break
+            await application.update_queue.put(Update.de_json(payload, application.bot))
+    finally:
+        # Handlers for every update already taken finish first, then running agent runs
+        await application.stop()
+        await main.close_resources(drain=WORKER_DRAIN_SECONDS)
+        await application.shutdown()
+        logger.info(f"Worker {index} stopped")
+
+
+def _next(updates):
+    # A receiver that died without sending STOP leaves nothing to wait for
+    while True:
+        try:
+            return updates.get(timeout=SUPERVISE_INTERVAL)
+        except queue.Empty:
+            if multiprocessing.parent_process() is not None and not multiprocessing.parent_process().is_alive():
+                return STOP
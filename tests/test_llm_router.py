@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+import llm_router
+from llm_router import Endpoint, LLMRouter
+
+
+class StubModel:
+    """Answers with its name after `delay` seconds, or raises `error`"""
+
+    def __init__(self, name: str, delay: float = 0.0, error: Exception = None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def ainvoke(self, messages, config=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.name
+
+
+@pytest.fixture(autouse=True)
+def quick_hedges(monkeypatch):
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_DEFAULT_DELAY", 0.05)
+
+
+def test_routes_to_lowest_ewma():
+    slow, fast = StubModel("slow"), StubModel("fast")
+    first, second = Endpoint("slow", slow), Endpoint("fast", fast)
+    first.ewma, second.ewma = 2.0, 0.5
+    router = LLMRouter([first, second])
+    assert asyncio.run(router.ainvoke([])) == "fast"
+    assert (slow.calls, fast.calls) == (0, 1)
+
+
+def test_out_raced_endpoint_is_no_longer_routed_first():
+    slow, fast = StubModel("slow", delay=1.0), StubModel("fast", delay=0.01)
+    router = LLMRouter([Endpoint("slow", slow), Endpoint("fast", fast)])
+
+    # Both unmeasured: the first endpoint is tried, the hedge answers
+    assert asyncio.run(router.ainvoke([])) == "fast"
+    assert router.hedges == router.hedge_wins == 1
+    slow_endpoint, fast_endpoint = router.endpoints
+    assert slow_endpoint.ewma is not None and slow_endpoint.ewma > fast_endpoint.ewma
+
+    assert asyncio.run(router.ainvoke([])) == "fast"
+    assert (slow.calls, fast.calls) == (1, 2)
+    assert router.hedges == 1
+
+
+def test_fails_over_when_primary_errors():
+    primary, fallback = StubModel("primary", error=RuntimeError("503")), StubModel("fallback")
+    router = LLMRouter([Endpoint("primary", primary), Endpoint("fallback", fallback, tier=1)])
+    assert asyncio.run(router.ainvoke([])) == "fallback"
+    assert router.failovers == 1
+    # The fast failure was retried once, on the only primary endpoint
+    assert primary.calls == 2
+
+
+def test_fails_over_when_primary_times_out():
+    primary, fallback = StubModel("primary", delay=1.0), StubModel("fallback")
+    router = LLMRouter([Endpoint("primary", primary), Endpoint("fallback", fallback, tier=1)], timeout=0.1)
+    assert asyncio.run(router.ainvoke([])) == "fallback"
+    assert router.failovers == 1
+    assert router.endpoints[0].failures == 1
+
+
+def test_raises_without_fallback():
+    router = LLMRouter([Endpoint("primary", StubModel("primary", error=RuntimeError("503")))], hedge=False)
+    with pytest.raises(RuntimeError, match="503"):
+        asyncio.run(router.ainvoke([]))
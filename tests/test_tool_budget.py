@@ -0,0 +1,57 @@
+import tool_budget
+
+
+def _listing(lines: list, total: int) -> str:
+    return f"Notes 1-{len(lines)} of {total}:\n" + "\n".join(f"#{i}: {line}" for i, line in enumerate(lines, 1))
+
+
+def test_header_only_match_keeps_opening_lines():
+    # "notes" only occurs in the header, which is not ranked
+    notes = _listing([f"meeting follow up with the design team about item {i}" for i in range(50)], 80)
+    trimmed = tool_budget.apply("get_notes", notes, "show me my notes")
+    lines = trimmed.splitlines()
+    assert lines[0] == "Notes 1-50 of 80:"
+    assert lines[1].startswith("#1: ")
+    assert lines[-1].endswith("more not shown]")
+
+
+def test_listing_keeps_matching_lines_only():
+    items = ["buy oat milk and coffee beans" if i in (7, 33) else f"project {i} review with the design team"
+             for i in range(1, 41)]
+    trimmed = tool_budget.apply("get_notes", _listing(items, 40), "what coffee do I need to buy")
+    assert trimmed.splitlines() == [
+        "Notes 1-40 of 40:",
+        "#7: buy oat milk and coffee beans",
+        "#33: buy oat milk and coffee beans",
+        "[… 38 more not shown]",
+    ]
+
+
+def test_prose_keeps_relevant_sentences_in_order():
+    filler = " ".join(f"Sentence number {i} talks about unrelated history of the region." for i in range(60))
+    text = f"Python is a programming language. {filler} Guido van Rossum created Python in 1991. {filler}"
+    trimmed = tool_budget.apply("wikipedia", text, "who created python")
+    assert trimmed.startswith("Python is a programming language.")
+    assert "Guido van Rossum created Python in 1991." in trimmed
+    assert "…" in trimmed
+    assert len(trimmed) < len(text)
+
+
+def test_no_overlap_keeps_opening_sentences():
+    text = " ".join(f"Sentence {i} is about rivers." for i in range(300))
+    trimmed = tool_budget.apply("wikipedia", text, "zzz")
+    assert trimmed.startswith("Sentence 0 is about rivers. Sentence 1 is about rivers.")
+
+
+def test_oversized_single_segment_is_cut():
+    text = "word " * 2000 + ". Tail sentence."
+    trimmed = tool_budget.select(text, "word", 50)
+    assert trimmed.endswith("…")
+    assert len(trimmed) <= 50 * 4 + 1
+
+
+def test_pinned_short_and_error_outputs_pass_through():
+    long_text = "x. " * 5000
+    assert tool_budget.apply("calculate", long_text, "") == long_text
+    assert tool_budget.apply("wikipedia", "Error: " + long_text, "") == "Error: " + long_text
+    assert tool_budget.apply("wikipedia", "Short answer.", "q") == "Short answer."